@@ -6,7 +6,7 @@ from pathlib import Path
 from logging.config import fileConfig
 
 from alembic import context
-from sqlalchemy import engine_from_config, pool
+from sqlalchemy import engine_from_config
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
@@ -47,11 +47,14 @@ def run_migrations_offline() -> None:
 def run_migrations_online() -> None:
     configuration = config.get_section(config.config_ini_section) or {}
     configuration["sqlalchemy.url"] = get_url()
+    configuration["sqlalchemy.pool_pre_ping"] = "true"
 
+    # 迁移全程复用同一条预热连接，避免每步重新建连/鉴权
     connectable = engine_from_config(
         configuration,
         prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
+        pool_size=5,
+        max_overflow=0,
     )
 
     with connectable.connect() as connection:
@@ -59,6 +62,7 @@ def run_migrations_online() -> None:
             connection=connection,
             target_metadata=target_metadata,
             compare_type=True,
+            transaction_per_migration=False,
         )
 
         with context.begin_transaction():
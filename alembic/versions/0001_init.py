@@ -27,6 +27,12 @@ if __name__ == "__main__":
 
 
 def upgrade() -> None:
+    # 先建全部表，再统一建索引（同一事务内，见 alembic/env.py）
+    _create_tables()
+    _create_indexes()
+
+
+def _create_tables() -> None:
     # parents
     op.create_table(
         "parents",
@@ -40,8 +46,6 @@ def upgrade() -> None:
         sa.UniqueConstraint("phone"),
         sa.UniqueConstraint("email"),
     )
-    op.create_index("ix_parents_phone", "parents", ["phone"], unique=True)
-    op.create_index("ix_parents_email", "parents", ["email"], unique=True)
 
     # auth_sessions
     op.create_table(
@@ -59,8 +63,6 @@ def upgrade() -> None:
         sa.PrimaryKeyConstraint("id"),
         sa.UniqueConstraint("token_hash"),
     )
-    op.create_index("ix_auth_sessions_parent_id", "auth_sessions", ["parent_id"], unique=False)
-    op.create_index("ix_auth_sessions_token_hash", "auth_sessions", ["token_hash"], unique=True)
 
     # children
     op.create_table(
@@ -77,7 +79,6 @@ def upgrade() -> None:
         sa.ForeignKeyConstraint(["parent_id"], ["parents.id"]),
         sa.PrimaryKeyConstraint("id"),
     )
-    op.create_index("ix_children_parent_id", "children", ["parent_id"], unique=False)
 
     # devices
     op.create_table(
@@ -96,8 +97,6 @@ def upgrade() -> None:
         sa.PrimaryKeyConstraint("id"),
         sa.UniqueConstraint("device_sn"),
     )
-    op.create_index("ix_devices_device_sn", "devices", ["device_sn"], unique=True)
-    op.create_index("ix_devices_bound_child_id", "devices", ["bound_child_id"], unique=False)
 
     # chat_sessions
     op.create_table(
@@ -110,7 +109,6 @@ def upgrade() -> None:
         sa.ForeignKeyConstraint(["child_id"], ["children.id"]),
         sa.PrimaryKeyConstraint("id"),
     )
-    op.create_index("ix_chat_sessions_child_id", "chat_sessions", ["child_id"], unique=False)
 
     # turns
     op.create_table(
@@ -137,6 +135,17 @@ def upgrade() -> None:
         sa.ForeignKeyConstraint(["session_id"], ["chat_sessions.id"]),
         sa.PrimaryKeyConstraint("id"),
     )
+
+
+def _create_indexes() -> None:
+    op.create_index("ix_parents_phone", "parents", ["phone"], unique=True)
+    op.create_index("ix_parents_email", "parents", ["email"], unique=True)
+    op.create_index("ix_auth_sessions_parent_id", "auth_sessions", ["parent_id"], unique=False)
+    op.create_index("ix_auth_sessions_token_hash", "auth_sessions", ["token_hash"], unique=True)
+    op.create_index("ix_children_parent_id", "children", ["parent_id"], unique=False)
+    op.create_index("ix_devices_device_sn", "devices", ["device_sn"], unique=True)
+    op.create_index("ix_devices_bound_child_id", "devices", ["bound_child_id"], unique=False)
+    op.create_index("ix_chat_sessions_child_id", "chat_sessions", ["child_id"], unique=False)
     op.create_index("ix_turns_session_id", "turns", ["session_id"], unique=False)
     op.create_index("ix_turns_device_id", "turns", ["device_id"], unique=False)
 
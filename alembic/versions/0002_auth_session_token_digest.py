@@ -0,0 +1,84 @@
+"""auth_sessions: store refresh token digest as BINARY(32) + 16-byte prefix index
+
+Revision ID: 0002_auth_session_token_digest
+Revises: 0001_init
+Create Date: 2026-10-15
+"""
+
+from __future__ import annotations
+
+# 执行方式：在项目根目录运行 `alembic upgrade head`。
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002_auth_session_token_digest"
+down_revision = "0001_init"
+branch_labels = None
+depends_on = None
+
+
+_auth_sessions = sa.table(
+    "auth_sessions",
+    sa.column("id", sa.Integer()),
+    sa.column("token_hash", sa.String(length=64)),
+    sa.column("token_digest", sa.BINARY(length=32)),
+    sa.column("token_prefix", sa.BINARY(length=16)),
+)
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("auth_sessions") as batch:
+        batch.add_column(sa.Column("token_digest", sa.BINARY(length=32), nullable=True))
+        batch.add_column(sa.Column("token_prefix", sa.BINARY(length=16), nullable=True))
+
+    # 已有会话：hex 摘要 -> 原始字节（保留登录态，不强制下线）
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(_auth_sessions.c.id, _auth_sessions.c.token_hash)).all()
+    for row_id, token_hash in rows:
+        digest = bytes.fromhex(token_hash)
+        conn.execute(
+            _auth_sessions.update()
+            .where(_auth_sessions.c.id == row_id)
+            .values(token_digest=digest, token_prefix=digest[:16])
+        )
+
+    op.drop_index("ix_auth_sessions_token_hash", table_name="auth_sessions")
+    with op.batch_alter_table("auth_sessions") as batch:
+        batch.drop_column("token_hash")
+        batch.alter_column(
+            "token_digest",
+            new_column_name="token_hash",
+            existing_type=sa.BINARY(length=32),
+            nullable=False,
+        )
+        batch.alter_column("token_prefix", existing_type=sa.BINARY(length=16), nullable=False)
+    op.create_index("ix_auth_sessions_token_prefix", "auth_sessions", ["token_prefix"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_auth_sessions_token_prefix", table_name="auth_sessions")
+    with op.batch_alter_table("auth_sessions") as batch:
+        batch.add_column(sa.Column("token_hex", sa.String(length=64), nullable=True))
+
+    t = sa.table(
+        "auth_sessions",
+        sa.column("id", sa.Integer()),
+        sa.column("token_hash", sa.BINARY(length=32)),
+        sa.column("token_hex", sa.String(length=64)),
+    )
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(t.c.id, t.c.token_hash)).all()
+    for row_id, digest in rows:
+        conn.execute(t.update().where(t.c.id == row_id).values(token_hex=bytes(digest).hex()))
+
+    with op.batch_alter_table("auth_sessions") as batch:
+        batch.drop_column("token_prefix")
+        batch.drop_column("token_hash")
+        batch.alter_column(
+            "token_hex",
+            new_column_name="token_hash",
+            existing_type=sa.String(length=64),
+            nullable=False,
+        )
+    op.create_index("ix_auth_sessions_token_hash", "auth_sessions", ["token_hash"], unique=True)
@@ -0,0 +1,28 @@
+"""turns: replace session_id index with composite (session_id, seq)
+
+Revision ID: 0003_turns_session_seq_index
+Revises: 0002_auth_session_token_digest
+Create Date: 2026-10-15
+"""
+
+from __future__ import annotations
+
+# 执行方式：在项目根目录运行 `alembic upgrade head`。
+from alembic import op
+
+
+revision = "0003_turns_session_seq_index"
+down_revision = "0002_auth_session_token_digest"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 先建复合索引再删单列索引：MySQL 外键要求 session_id 始终有可用索引
+    op.create_index("ix_turns_session_seq", "turns", ["session_id", "seq"], unique=False)
+    op.drop_index("ix_turns_session_id", table_name="turns")
+
+
+def downgrade() -> None:
+    op.create_index("ix_turns_session_id", "turns", ["session_id"], unique=False)
+    op.drop_index("ix_turns_session_seq", table_name="turns")
@@ -0,0 +1,52 @@
+"""chat_sessions: add last_seq (latest turn seq) to skip MAX(seq) per turn
+
+Revision ID: 0004_chat_sessions_last_seq
+Revises: 0003_turns_session_seq_index
+Create Date: 2026-10-15
+"""
+
+from __future__ import annotations
+
+# 执行方式：在项目根目录运行 `alembic upgrade head`。
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004_chat_sessions_last_seq"
+down_revision = "0003_turns_session_seq_index"
+branch_labels = None
+depends_on = None
+
+
+_chat_sessions = sa.table(
+    "chat_sessions",
+    sa.column("id", sa.Integer()),
+    sa.column("last_seq", sa.Integer()),
+)
+_turns = sa.table(
+    "turns",
+    sa.column("session_id", sa.Integer()),
+    sa.column("seq", sa.Integer()),
+)
+
+
+def upgrade() -> None:
+    # server_default 仅用于给已有行填 0，应用侧由 ORM default 写入
+    with op.batch_alter_table("chat_sessions") as batch:
+        batch.add_column(sa.Column("last_seq", sa.Integer(), nullable=False, server_default="0"))
+
+    # 已有会话：回填为当前最大 seq（走 ix_turns_session_seq）
+    max_seq = (
+        sa.select(sa.func.coalesce(sa.func.max(_turns.c.seq), 0))
+        .where(_turns.c.session_id == _chat_sessions.c.id)
+        .scalar_subquery()
+    )
+    op.execute(_chat_sessions.update().values(last_seq=max_seq))
+
+    with op.batch_alter_table("chat_sessions") as batch:
+        batch.alter_column("last_seq", existing_type=sa.Integer(), existing_nullable=False, server_default=None)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("chat_sessions") as batch:
+        batch.drop_column("last_seq")
@@ -31,14 +31,7 @@ def register(
     uc: AuthUsecase = Depends(get_auth_usecase),
 ):
     issued = uc.register(db, phone=req.phone, code=req.code)
-    return schemas.TokenPairResponse(
-        access_token=issued.access_token,
-        refresh_token=issued.refresh_token,
-        expires_in=issued.expires_in,
-        refresh_expires_in=issued.refresh_expires_in,
-        parent_id=issued.parent_id,
-        phone=issued.phone,
-    )
+    return schemas.TokenPairResponse.model_validate(issued, from_attributes=True)
 
 
 @router.post("/login", response_model=schemas.TokenPairResponse)
@@ -48,14 +41,7 @@ def login(
     uc: AuthUsecase = Depends(get_auth_usecase),
 ):
     issued = uc.login(db, phone=req.phone, code=req.code)
-    return schemas.TokenPairResponse(
-        access_token=issued.access_token,
-        refresh_token=issued.refresh_token,
-        expires_in=issued.expires_in,
-        refresh_expires_in=issued.refresh_expires_in,
-        parent_id=issued.parent_id,
-        phone=issued.phone,
-    )
+    return schemas.TokenPairResponse.model_validate(issued, from_attributes=True)
 
 
 @router.post("/refresh", response_model=schemas.TokenPairResponse)
@@ -65,14 +51,7 @@ def refresh(
     uc: AuthUsecase = Depends(get_auth_usecase),
 ):
     issued = uc.refresh(db, refresh_token=req.refresh_token)
-    return schemas.TokenPairResponse(
-        access_token=issued.access_token,
-        refresh_token=issued.refresh_token,
-        expires_in=issued.expires_in,
-        refresh_expires_in=issued.refresh_expires_in,
-        parent_id=issued.parent_id,
-        phone=issued.phone,
-    )
+    return schemas.TokenPairResponse.model_validate(issued, from_attributes=True)
 
 
 @router.post("/logout")
@@ -4,21 +4,22 @@
 
 from __future__ import annotations
 
-from typing import Generator
+from functools import lru_cache
+from typing import Generator, Optional
 
-from fastapi import Depends
-from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from fastapi import Depends, Request
+from fastapi.security import HTTPBearer
 from sqlalchemy.orm import Session
 
 from app.application.auth.otp_service import OtpService
 from app.application.auth.token_service import TokenService
-from app.application.auth.usecase import AuthUsecase
+from app.application.auth.usecase import AuthUsecase, CurrentParent
 from app.application.history.usecase import HistoryUsecase
 from app.application.profile.usecase import ProfileUsecase
 from app.application.ws.voice_ws_handler import VoiceWsHandler
 from app.common.errors import UnauthorizedError
-from app.domain import models
 from app.infra.db import SessionLocal
+from app.infra.redis_client import get_redis
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -28,46 +29,63 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
-_otp_singleton = OtpService()
-_token_singleton = TokenService()
-_auth_uc_singleton = AuthUsecase(_otp_singleton, _token_singleton)
-_profile_uc_singleton = ProfileUsecase()
-_history_uc_singleton = HistoryUsecase()
-_voice_ws_handler_singleton = VoiceWsHandler()
+@lru_cache(maxsize=None)
+def get_otp_service() -> OtpService:
+    return OtpService(redis_client=get_redis())
 
 
+@lru_cache(maxsize=None)
+def get_token_service() -> TokenService:
+    return TokenService()
+
+
+@lru_cache(maxsize=None)
 def get_auth_usecase() -> AuthUsecase:
-    return _auth_uc_singleton
+    return AuthUsecase(get_otp_service(), get_token_service())
 
 
+@lru_cache(maxsize=None)
 def get_profile_usecase() -> ProfileUsecase:
-    return _profile_uc_singleton
+    return ProfileUsecase()
 
 
+@lru_cache(maxsize=None)
 def get_history_usecase() -> HistoryUsecase:
-    return _history_uc_singleton
+    return HistoryUsecase()
 
 
+@lru_cache(maxsize=None)
 def get_voice_ws_handler() -> VoiceWsHandler:
-    return _voice_ws_handler_singleton
+    return VoiceWsHandler()
+
+
+class _BearerToken(HTTPBearer):
+    """ 直接切 Authorization 头取 token（不构造 HTTPAuthorizationCredentials），保留 OpenAPI 的 bearer 声明 """
+
+    async def __call__(self, request: Request) -> Optional[str]:  # type: ignore[override]
+        auth = request.headers.get("authorization")
+        if auth and auth[:7].lower() == "bearer ":
+            return auth[7:]
+        return None
+
 
-_bearer = HTTPBearer(auto_error=False)
+_bearer = _BearerToken(scheme_name="HTTPBearer", auto_error=False)
 
 
 def get_current_parent(
     db: Session = Depends(get_db),
-    credentials: HTTPAuthorizationCredentials | None = Depends(_bearer),
-) -> models.Parent:
-    if credentials is None or not credentials.credentials:
+    token: Optional[str] = Depends(_bearer),
+) -> CurrentParent:
+    if not token:
         raise UnauthorizedError(code="TOKEN_MISSING", message="missing access token")
 
-    payload = _token_singleton.decode_access_token(credentials.credentials)
+    payload = get_token_service().decode_access_token(token)
     try:
         parent_id = int(payload.get("sub"))
     except Exception as e:  # noqa: BLE001
         raise UnauthorizedError(code="TOKEN_INVALID", message="invalid access token") from e
 
-    parent = db.get(models.Parent, parent_id)
+    parent = get_auth_usecase().get_parent(db, parent_id)
     if parent is None:
         raise UnauthorizedError(code="TOKEN_USER_NOT_FOUND", message="parent not found")
     return parent
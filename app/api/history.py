@@ -8,8 +8,9 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_parent, get_db, get_history_usecase
+from app.application.auth.usecase import CurrentParent
 from app.application.history.usecase import HistoryUsecase
-from app.domain import models, schemas
+from app.domain import schemas
 
 
 router = APIRouter(prefix="/history", tags=["history"])
@@ -20,7 +21,7 @@ def list_child_sessions(
     child_id: int,
     limit: int = 20,
     db: Session = Depends(get_db),
-    parent: models.Parent = Depends(get_current_parent),
+    parent: CurrentParent = Depends(get_current_parent),
     uc: HistoryUsecase = Depends(get_history_usecase),
 ):
     sessions = uc.list_sessions_for_child(db, parent=parent, child_id=child_id, limit=limit)
@@ -31,7 +32,7 @@ def list_child_sessions(
 def get_session_detail(
     session_id: int,
     db: Session = Depends(get_db),
-    parent: models.Parent = Depends(get_current_parent),
+    parent: CurrentParent = Depends(get_current_parent),
     uc: HistoryUsecase = Depends(get_history_usecase),
 ):
     return uc.get_session_detail(db, parent=parent, session_id=session_id)
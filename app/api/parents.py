@@ -8,8 +8,9 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_parent, get_db, get_profile_usecase
+from app.application.auth.usecase import CurrentParent
 from app.application.profile.usecase import ProfileUsecase
-from app.domain import models, schemas
+from app.domain import schemas
 
 
 router = APIRouter(prefix="/parents", tags=["parents"])
@@ -19,7 +20,7 @@ router = APIRouter(prefix="/parents", tags=["parents"])
 def setup_parent_child_device(
     req: schemas.ParentSetupRequest,
     db: Session = Depends(get_db),
-    parent: models.Parent = Depends(get_current_parent),
+    parent: CurrentParent = Depends(get_current_parent),
     uc: ProfileUsecase = Depends(get_profile_usecase),
 ):
     return uc.setup_parent_child_device(db, parent=parent, req=req)
@@ -29,7 +30,7 @@ def setup_parent_child_device(
 def get_child_profile(
     child_id: int,
     db: Session = Depends(get_db),
-    parent: models.Parent = Depends(get_current_parent),
+    parent: CurrentParent = Depends(get_current_parent),
     uc: ProfileUsecase = Depends(get_profile_usecase),
 ):
     return uc.get_child_profile(db, parent=parent, child_id=child_id)
@@ -40,7 +41,7 @@ def update_child_profile(
     child_id: int,
     req: schemas.ChildProfileUpdateRequest,
     db: Session = Depends(get_db),
-    parent: models.Parent = Depends(get_current_parent),
+    parent: CurrentParent = Depends(get_current_parent),
     uc: ProfileUsecase = Depends(get_profile_usecase),
 ):
     return uc.update_child_profile(db, parent=parent, child_id=child_id, req=req)
@@ -4,14 +4,69 @@
 
 from __future__ import annotations
 
+import threading
 import time
 from dataclasses import dataclass
-from typing import Dict
+from typing import TYPE_CHECKING, Dict, Optional
 
 from app.common.errors import BadRequestError, TooManyRequestsError, UnauthorizedError
 from app.infra.config import settings
 from app.infra.ylogger import ylogger
 
+if TYPE_CHECKING:
+    import redis
+
+
+# 连续失败达到上限后的锁定时长（秒）
+_LOCK_SECONDS = 300
+
+# 校验验证码：GET + 计数 + 删除在 Redis 端原子完成，避免并发校验的竞态
+# KEYS: otp:{phone} otp:lock:{phone}
+# ARGV: code now max_fails lock_seconds
+# 返回 {status, value}：0 成功；1 验证码错误(value=失败次数)；-1 未发送；-2 已锁定(value=剩余秒数)；-3 已过期
+_VERIFY_LUA = """
+local lock_ttl = redis.call('TTL', KEYS[2])
+if lock_ttl > 0 then
+    return {-2, lock_ttl}
+end
+local rec = redis.call('HMGET', KEYS[1], 'code', 'expires_at')
+if not rec[1] then
+    return {-1, 0}
+end
+if tonumber(ARGV[2]) > tonumber(rec[2]) then
+    return {-3, 0}
+end
+if rec[1] == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return {0, 0}
+end
+local fails = redis.call('HINCRBY', KEYS[1], 'fail_count', 1)
+if fails >= tonumber(ARGV[3]) then
+    redis.call('SET', KEYS[2], 1, 'EX', ARGV[4])
+end
+return {1, fails}
+"""
+
+# 发送验证码：锁定检查 + 发送频控 + 写入验证码在 Redis 端一次完成（1 次往返）
+# KEYS: otp:{phone} otp:last:{phone} otp:lock:{phone}
+# ARGV: code ttl interval now
+# 返回 {status, value}：0 成功(value=ttl)；-2 已锁定(value=剩余秒数)；-4 发送过频(value=剩余秒数)
+_SEND_LUA = """
+local lock_ttl = redis.call('TTL', KEYS[3])
+if lock_ttl > 0 then
+    return {-2, lock_ttl}
+end
+local interval = tonumber(ARGV[3])
+if interval > 0 and not redis.call('SET', KEYS[2], ARGV[4], 'EX', interval, 'NX') then
+    return {-4, math.max(redis.call('TTL', KEYS[2]), 0)}
+end
+local ttl = tonumber(ARGV[2])
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], 'code', ARGV[1], 'expires_at', tonumber(ARGV[4]) + ttl, 'fail_count', 0)
+redis.call('EXPIRE', KEYS[1], ttl * 2)
+return {0, ttl}
+"""
+
 
 @dataclass
 class OtpRecord:
@@ -24,15 +79,36 @@ class OtpRecord:
 
 
 class OtpService:
-    """ 短信验证码(测试用) 生产环境建议 Redis """
+    """ 短信验证码(测试用) 配置 Redis 时状态存 Redis，否则存进程内 dict（仅适合单进程） """
 
-    def __init__(self) -> None:
+    def __init__(self, redis_client: Optional["redis.Redis"] = None) -> None:
+        self._ttl = int(settings.OTP_TTL_SECONDS)
+        self._interval = int(settings.OTP_SEND_INTERVAL_SECONDS)
+        self._max_fails = int(settings.OTP_MAX_VERIFY_FAILS)
+        self._fixed_code = str(settings.SMS_FIXED_CODE)
         self._store: Dict[str, OtpRecord] = {}
+        # 进程内实现的读-改-写需串行，避免并发请求绕过频控/失败计数
+        self._local_lock = threading.Lock()
+        self._redis = redis_client
+        self._send_script = redis_client.register_script(_SEND_LUA) if redis_client is not None else None
+        self._verify_script = redis_client.register_script(_VERIFY_LUA) if redis_client is not None else None
 
     def send_code(self, phone: str, scene: str = "login") -> int:
         now = int(time.time())
-        ttl = int(settings.OTP_TTL_SECONDS)
+        ttl = self._ttl
+
+        if self._redis is not None:
+            self._send_code_redis(phone, now, ttl)
+        else:
+            with self._local_lock:
+                self._send_code_local(phone, now, ttl)
+
+        code = self._fixed_code
+        # 不真正触发
+        ylogger.info("[SMS] send otp: phone=%s scene=%s code=%s ttl=%ss", phone, scene, code, ttl)
+        return ttl
 
+    def _send_code_local(self, phone: str, now: int, ttl: int) -> None:
         rec = self._store.get(phone)
         if rec is not None:
             # 锁定期内直接拒绝
@@ -44,30 +120,55 @@ class OtpService:
                 )
 
             # 发送频控
-            if now - rec.last_sent_at < int(settings.OTP_SEND_INTERVAL_SECONDS):
+            if now - rec.last_sent_at < self._interval:
                 raise TooManyRequestsError(
                     code="OTP_TOO_FREQUENT",
                     message="otp send too frequent",
-                    detail={"retry_after": int(settings.OTP_SEND_INTERVAL_SECONDS) - (now - rec.last_sent_at)},
+                    detail={"retry_after": self._interval - (now - rec.last_sent_at)},
                 )
 
-        code = str(settings.SMS_FIXED_CODE)
-        expires_at = now + ttl
         self._store[phone] = OtpRecord(
             phone=phone,
-            code=code,
-            expires_at=expires_at,
+            code=self._fixed_code,
+            expires_at=now + ttl,
             last_sent_at=now,
             fail_count=0,
             locked_until=0,
         )
 
-        # 不真正触发
-        ylogger.info("[SMS] send otp: phone=%s scene=%s code=%s ttl=%ss", phone, scene, code, ttl)
-        return ttl
+    def _send_code_redis(self, phone: str, now: int, ttl: int) -> None:
+        assert self._send_script is not None
+        # 记录保留 2 倍有效期（脚本内），便于区分“已过期”和“未发送”
+        status, value = self._send_script(
+            keys=[f"otp:{phone}", f"otp:last:{phone}", f"otp:lock:{phone}"],
+            args=[self._fixed_code, ttl, self._interval, now],
+        )
+        status, value = int(status), int(value)
 
-    def verify_code(self, phone: str, code: str) -> None:
-        now = int(time.time())
+        if status == -2:
+            raise TooManyRequestsError(
+                code="OTP_LOCKED",
+                message="too many failed attempts",
+                detail={"retry_after": value},
+            )
+        if status == -4:
+            raise TooManyRequestsError(
+                code="OTP_TOO_FREQUENT",
+                message="otp send too frequent",
+                detail={"retry_after": value},
+            )
+
+    def verify_code(self, phone: str, code: str, now: Optional[int] = None) -> None:
+        if now is None:
+            now = int(time.time())
+        if self._redis is not None:
+            self._verify_code_redis(phone, code, now)
+            return
+
+        with self._local_lock:
+            self._verify_code_local(phone, code, now)
+
+    def _verify_code_local(self, phone: str, code: str, now: int) -> None:
         rec = self._store.get(phone)
         if rec is None:
             raise BadRequestError(code="OTP_NOT_SENT", message="otp not sent")
@@ -83,16 +184,41 @@ class OtpService:
             raise UnauthorizedError(code="OTP_EXPIRED", message="otp expired")
 
         if str(code) != str(rec.code):
+            # rec 即 _store 中的对象，原地更新即可（已在 _local_lock 内）
             rec.fail_count += 1
-
-            if rec.fail_count >= int(settings.OTP_MAX_VERIFY_FAILS):
-                rec.locked_until = now + 300
-            self._store[phone] = rec
+            if rec.fail_count >= self._max_fails:
+                rec.locked_until = now + _LOCK_SECONDS
             raise UnauthorizedError(
                 code="OTP_INVALID",
                 message="invalid otp",
-                detail={"remain": max(int(settings.OTP_MAX_VERIFY_FAILS) - rec.fail_count, 0)},
+                detail={"remain": max(self._max_fails - rec.fail_count, 0)},
             )
 
         # 验证成功, 清理 record，避免复用
         self._store.pop(phone, None)
+
+    def _verify_code_redis(self, phone: str, code: str, now: int) -> None:
+        assert self._verify_script is not None
+        status, value = self._verify_script(
+            keys=[f"otp:{phone}", f"otp:lock:{phone}"],
+            args=[str(code), now, self._max_fails, _LOCK_SECONDS],
+        )
+        status, value = int(status), int(value)
+
+        if status == 0:
+            return
+        if status == -1:
+            raise BadRequestError(code="OTP_NOT_SENT", message="otp not sent")
+        if status == -2:
+            raise TooManyRequestsError(
+                code="OTP_LOCKED",
+                message="too many failed attempts",
+                detail={"retry_after": value},
+            )
+        if status == -3:
+            raise UnauthorizedError(code="OTP_EXPIRED", message="otp expired")
+        raise UnauthorizedError(
+            code="OTP_INVALID",
+            message="invalid otp",
+            detail={"remain": max(self._max_fails - value, 0)},
+        )
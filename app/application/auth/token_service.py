@@ -8,7 +8,7 @@ import hashlib
 import secrets
 import time
 from dataclasses import dataclass
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import jwt
 
@@ -27,10 +27,14 @@ class TokenPair:
 class TokenService:
     def __init__(self) -> None:
         self._jwt_secret = settings.JWT_SECRET_KEY
+        self._jwt_secret_bytes = self._jwt_secret.encode("utf-8")
         self._jwt_alg = "HS256"
+        # 每个鉴权请求都会解码：密钥字节与算法列表只构造一次
+        self._jwt_algorithms = [self._jwt_alg]
 
-    def make_access_token(self, *, parent_id: int, phone: str) -> TokenPair:
-        now = int(time.time())
+    def make_access_token(self, *, parent_id: int, phone: str, now: Optional[int] = None) -> TokenPair:
+        if now is None:
+            now = int(time.time())
         access_exp = now + int(settings.ACCESS_TOKEN_EXPIRE_MINUTES) * 60
         refresh_exp = now + int(settings.REFRESH_TOKEN_EXPIRE_DAYS) * 86400
 
@@ -53,7 +57,7 @@ class TokenService:
 
     def decode_access_token(self, token: str) -> Dict[str, Any]:
         try:
-            payload = jwt.decode(token, self._jwt_secret, algorithms=[self._jwt_alg])
+            payload = jwt.decode(token, self._jwt_secret_bytes, algorithms=self._jwt_algorithms)
         except Exception as e:  # noqa: BLE001
             raise UnauthorizedError(code="TOKEN_INVALID", message="invalid access token") from e
 
@@ -61,11 +65,13 @@ class TokenService:
             raise UnauthorizedError(code="TOKEN_INVALID", message="invalid access token")
         return payload
 
-    def hash_refresh_token(self, refresh_token: str) -> str:
-        return hashlib.sha256(refresh_token.encode("utf-8")).hexdigest()
+    def hash_refresh_token(self, refresh_token: str) -> bytes:
+        return hashlib.sha256(refresh_token.encode("utf-8")).digest()
 
-    def refresh_expire_at(self) -> int:
-        return int(time.time()) + int(settings.REFRESH_TOKEN_EXPIRE_DAYS) * 86400
+    def refresh_expire_at(self, now: Optional[int] = None) -> int:
+        if now is None:
+            now = int(time.time())
+        return now + int(settings.REFRESH_TOKEN_EXPIRE_DAYS) * 86400
 
     def _new_refresh_token(self) -> str:
         return secrets.token_urlsafe(48)
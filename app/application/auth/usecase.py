@@ -4,58 +4,90 @@
 
 from __future__ import annotations
 
+import hmac
+import threading
 import time
 from dataclasses import dataclass
 from typing import Optional
 
-from sqlalchemy.orm import Session
+from cachetools import TTLCache
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, load_only
 
 from app.application.auth.otp_service import OtpService
 from app.application.auth.token_service import TokenService
 from app.common.errors import BadRequestError, NotFoundError, UnauthorizedError
 from app.domain import models
+from app.infra.db import safe_select
 
 
 class AuthUsecase:
     def __init__(self, otp: OtpService, tokens: TokenService) -> None:
         self._otp = otp
         self._tokens = tokens
+        # 鉴权热路径：parent_id -> CurrentParent（不可变的列快照，不持有 ORM 对象），命中时免一次按主键查询；
+        # access token 在过期前始终有效，缓存只影响 id/phone/email 的新鲜度，由 TTL 兜底
+        self._parent_cache: TTLCache = TTLCache(maxsize=10_000, ttl=60)
+        self._parent_cache_lock = threading.Lock()
 
     def send_code(self, phone: str, scene: str = "login") -> int:
         return self._otp.send_code(phone, scene=scene)
 
     def register(self, db: Session, *, phone: str, code: str, email: Optional[str] = None) -> "IssuedTokenPair":
-        self._otp.verify_code(phone, code)
+        now = int(time.time())
+        self._otp.verify_code(phone, code, now=now)
 
-        existed = db.query(models.Parent).filter(models.Parent.phone == phone).first()
+        existed = db.execute(select(models.Parent.id).where(models.Parent.phone == phone).limit(1)).scalar()
         if existed is not None:
             raise BadRequestError(code="PHONE_ALREADY_REGISTERED", message="phone already registered")
 
         parent = models.Parent(phone=phone, email=email)
         db.add(parent)
-        db.commit()
-        db.refresh(parent)
+        db.flush()
 
-        return self._issue_tokens(db, parent)
+        pair = self._issue_tokens(db, parent, now)
+        db.commit()
+        return pair
 
     def login(self, db: Session, *, phone: str, code: str) -> "IssuedTokenPair":
-        self._otp.verify_code(phone, code)
-
-        parent = db.query(models.Parent).filter(models.Parent.phone == phone).first()
+        now = int(time.time())
+        self._otp.verify_code(phone, code, now=now)
+
+        # 签发 token 只用到 id/phone
+        parent = db.execute(
+            safe_select(models.Parent)
+            .options(load_only(models.Parent.id, models.Parent.phone))
+            .where(models.Parent.phone == phone)
+        ).scalar_one_or_none()
         if parent is None:
             raise NotFoundError(code="PHONE_NOT_REGISTERED", message="phone not registered")
 
-        return self._issue_tokens(db, parent)
+        pair = self._issue_tokens(db, parent, now)
+        db.commit()
+        return pair
+
+    def get_parent(self, db: Session, parent_id: int) -> Optional["CurrentParent"]:
+        """按 id 获取当前家长快照，带进程内 TTL 缓存"""
+        with self._parent_cache_lock:
+            cached = self._parent_cache.get(parent_id)
+        if cached is not None:
+            return cached
+
+        row = db.execute(
+            select(models.Parent.id, models.Parent.phone, models.Parent.email).where(models.Parent.id == parent_id)
+        ).one_or_none()
+        if row is None:
+            return None
+        parent = CurrentParent(id=row.id, phone=row.phone, email=row.email)
+        with self._parent_cache_lock:
+            self._parent_cache[parent_id] = parent
+        return parent
 
     def refresh(self, db: Session, *, refresh_token: str) -> "IssuedTokenPair":
         now = int(time.time())
         token_hash = self._tokens.hash_refresh_token(refresh_token)
 
-        sess = (
-            db.query(models.AuthSession)
-            .filter(models.AuthSession.token_hash == token_hash)
-            .first()
-        )
+        sess = self._find_auth_session(db, token_hash)
         if sess is None or sess.revoked_at is not None:
             raise UnauthorizedError(code="REFRESH_INVALID", message="invalid refresh token")
         if now > int(sess.expires_at):
@@ -65,45 +97,63 @@ class AuthUsecase:
         if parent is None:
             raise UnauthorizedError(code="REFRESH_INVALID", message="invalid refresh token")
 
-        sess.revoked_at = now
-        sess.last_seen_at = now
-        db.add(sess)
+        # 带 revoked_at IS NULL 条件：并发刷新同一 refresh_token 时只有一个能成功
+        revoked = db.execute(
+            update(models.AuthSession)
+            .where(models.AuthSession.id == sess.id, models.AuthSession.revoked_at.is_(None))
+            .values(revoked_at=now, last_seen_at=now)
+        )
+        if revoked.rowcount != 1:
+            db.rollback()
+            raise UnauthorizedError(code="REFRESH_INVALID", message="invalid refresh token")
 
-        pair = self._issue_tokens(db, parent)
+        pair = self._issue_tokens(db, parent, now)
         db.commit()
         return pair
 
     def logout(self, db: Session, *, refresh_token: str) -> None:
         now = int(time.time())
         token_hash = self._tokens.hash_refresh_token(refresh_token)
-        sess = (
-            db.query(models.AuthSession)
-            .filter(models.AuthSession.token_hash == token_hash)
-            .first()
-        )
+        sess = self._find_auth_session(db, token_hash)
         if sess is None:
             return
-        sess.revoked_at = now
-        sess.last_seen_at = now
-        db.add(sess)
+        db.execute(
+            update(models.AuthSession)
+            .where(models.AuthSession.id == sess.id)
+            .values(revoked_at=now, last_seen_at=now)
+        )
         db.commit()
 
-    def _issue_tokens(self, db: Session, parent: models.Parent) -> "IssuedTokenPair":
-        now = int(time.time())
-        pair = self._tokens.make_access_token(parent_id=parent.id, phone=parent.phone)
+    def _find_auth_session(self, db: Session, token_hash: bytes):
+        """按摘要前缀走索引，只取校验需要的列（不实例化 ORM 对象），再比对完整摘要"""
+        stmt = select(
+            models.AuthSession.id,
+            models.AuthSession.parent_id,
+            models.AuthSession.token_hash,
+            models.AuthSession.revoked_at,
+            models.AuthSession.expires_at,
+        ).where(models.AuthSession.token_prefix == token_hash[:16])
+        for row in db.execute(stmt):
+            if hmac.compare_digest(row.token_hash, token_hash):
+                return row
+        return None
+
+    def _issue_tokens(self, db: Session, parent: models.Parent, now: int) -> "IssuedTokenPair":
+        """签发 token 并登记 refresh 会话；只 add 不 commit，由调用方在同一事务内提交"""
+        pair = self._tokens.make_access_token(parent_id=parent.id, phone=parent.phone, now=now)
 
         token_hash = self._tokens.hash_refresh_token(pair.refresh_token)
-        expires_at = self._tokens.refresh_expire_at()
+        expires_at = self._tokens.refresh_expire_at(now)
         sess = models.AuthSession(
             parent_id=parent.id,
             token_hash=token_hash,
+            token_prefix=token_hash[:16],
             created_at=now,
             expires_at=expires_at,
             revoked_at=None,
             last_seen_at=now,
         )
         db.add(sess)
-        db.commit()
         return IssuedTokenPair(
             parent_id=parent.id,
             phone=parent.phone,
@@ -114,6 +164,15 @@ class AuthUsecase:
         )
 
 
+@dataclass(frozen=True)
+class CurrentParent:
+    """当前登录家长的只读快照（鉴权依赖返回值），可安全地跨请求缓存"""
+
+    id: int
+    phone: str
+    email: Optional[str]
+
+
 @dataclass
 class IssuedTokenPair:
     parent_id: int
@@ -6,20 +6,91 @@ from __future__ import annotations
 
 from typing import List
 
-from sqlalchemy import select
+from sqlalchemy import bindparam, case, func, select
 from sqlalchemy.orm import Session
 
+from app.application.auth.usecase import CurrentParent
 from app.common.errors import ForbiddenError, NotFoundError
 from app.domain import models, schemas
 from app.infra import storage_s3
 
 
+# 热点查询在模块加载时构造一次，参数走 bindparam；语句对象复用，命中 SQLAlchemy 编译缓存
+
+# 先取本页会话，再按会话聚合轮次数/风险标记，一条 SQL 完成，不加载 Turn 对象
+_session_page = (
+    select(
+        models.ChatSession.id,
+        models.ChatSession.title,
+        models.ChatSession.started_at,
+        models.ChatSession.ended_at,
+    )
+    .where(models.ChatSession.child_id == bindparam("child_id"))
+    .order_by(models.ChatSession.id.desc())
+    .limit(bindparam("limit"))
+    .subquery()
+)
+_SESSION_PAGE_STMT = (
+    select(
+        _session_page.c.id,
+        _session_page.c.title,
+        _session_page.c.started_at,
+        _session_page.c.ended_at,
+        func.count(models.Turn.id).label("turn_count"),
+        func.coalesce(func.max(case((models.Turn.risk_flag, 1), else_=0)), 0).label("has_risk"),
+    )
+    .outerjoin(models.Turn, models.Turn.session_id == _session_page.c.id)
+    .group_by(_session_page.c.id, _session_page.c.title, _session_page.c.started_at, _session_page.c.ended_at)
+    .order_by(_session_page.c.id.desc())
+)
+
+# 会话详情头部：会话 + 归属家长 + 所用设备（取第一轮的设备）一次取回，代替逐个按主键查询
+_SESSION_HEADER_STMT = (
+    select(
+        models.ChatSession.id,
+        models.ChatSession.child_id,
+        models.ChatSession.started_at,
+        models.ChatSession.ended_at,
+        models.Child.parent_id,
+        select(models.Device.device_sn)
+        .join(models.Turn, models.Turn.device_id == models.Device.id)
+        .where(models.Turn.session_id == models.ChatSession.id)
+        .order_by(models.Turn.seq.asc())
+        .limit(1)
+        .scalar_subquery()
+        .label("device_sn"),
+    )
+    .outerjoin(models.Child, models.Child.id == models.ChatSession.child_id)
+    .where(models.ChatSession.id == bindparam("session_id"))
+)
+
+# 长会话：服务端游标按批取行（yield_per），驱动层不一次缓冲全部结果行；只取响应需要的列，不构造 Turn ORM 对象。
+# 响应仍是单个 SessionDetail，所有轮次都会映射进 items，内存峰值随轮次数线性增长（未分页）
+_SESSION_TURNS_STMT = (
+    select(
+        models.Turn.id,
+        models.Turn.seq,
+        models.Turn.created_at,
+        models.Turn.user_text,
+        models.Turn.reply_text,
+        models.Turn.user_audio_path,
+        models.Turn.reply_audio_path,
+        models.Turn.risk_flag,
+        models.Turn.risk_source,
+        models.Turn.risk_reason,
+    )
+    .where(models.Turn.session_id == bindparam("session_id"))
+    .order_by(models.Turn.seq.asc())
+    .execution_options(yield_per=200)
+)
+
+
 class HistoryUsecase:
     def list_sessions_for_child(
         self,
         db: Session,
         *,
-        parent: models.Parent,
+        parent: CurrentParent,
         child_id: int,
         limit: int = 20,
     ) -> List[schemas.SessionSummary]:
@@ -29,82 +100,58 @@ class HistoryUsecase:
         if child.parent_id != parent.id:
             raise ForbiddenError(code="CHILD_FORBIDDEN", message="child not belongs to current parent")
 
-        stmt = (
-            select(models.ChatSession)
-            .where(models.ChatSession.child_id == child_id)
-            .order_by(models.ChatSession.id.desc())
-            .limit(limit)
-        )
-        sessions = list(db.scalars(stmt).all())
-        items: List[schemas.SessionSummary] = []
-        for s in sessions:
-            turns = list(getattr(s, "turns", []) or [])
-            items.append(
-                schemas.SessionSummary(
-                    session_id=s.id,
-                    title=s.title,
-                    started_at=s.started_at,
-                    ended_at=s.ended_at,
-                    turn_count=len(turns),
-                    has_risk=any(bool(getattr(t, "risk_flag", False)) for t in turns),
-                )
+        items: List[schemas.SessionSummary] = [
+            schemas.SessionSummary(
+                session_id=row.id,
+                title=row.title,
+                started_at=row.started_at,
+                ended_at=row.ended_at,
+                turn_count=int(row.turn_count),
+                has_risk=bool(row.has_risk),
             )
+            for row in db.execute(_SESSION_PAGE_STMT, {"child_id": child_id, "limit": limit})
+        ]
         return items
 
     def get_session_detail(
         self,
         db: Session,
         *,
-        parent: models.Parent,
+        parent: CurrentParent,
         session_id: int,
     ) -> schemas.SessionDetail:
-        session = db.get(models.ChatSession, session_id)
+        session = db.execute(_SESSION_HEADER_STMT, {"session_id": session_id}).one_or_none()
         if session is None:
             raise NotFoundError(code="SESSION_NOT_FOUND", message="session not found")
-
-        child = db.get(models.Child, session.child_id)
-        if child is None:
+        if session.parent_id is None:
             raise NotFoundError(code="CHILD_NOT_FOUND", message="child not found")
-        if child.parent_id != parent.id:
+        if session.parent_id != parent.id:
             raise ForbiddenError(code="SESSION_FORBIDDEN", message="session not belongs to current parent")
 
-        turn_stmt = (
-            select(models.Turn)
-            .where(models.Turn.session_id == session_id)
-            .order_by(models.Turn.seq.asc())
-        )
-        turns = list(db.scalars(turn_stmt).all())
-
-        device_sn = ""
-        if turns:
-            try:
-                device_sn = turns[0].device.device_sn
-            except Exception:  # noqa: BLE001
-                device_sn = ""
-
         items: List[schemas.SessionTurn] = []
-        for t in turns:
-            user_audio_url = storage_s3.build_url(t.user_audio_path) if t.user_audio_path else None
-            reply_audio_url = storage_s3.build_url(t.reply_audio_path) if t.reply_audio_path else None
-            items.append(
+        # 按 yield_per 分批取行，每批的音频 URL 批量生成（存储配置只解析一次）
+        for rows in db.execute(_SESSION_TURNS_STMT, {"session_id": session_id}).partitions():
+            urls = storage_s3.build_urls({p for r in rows for p in (r.user_audio_path, r.reply_audio_path) if p})
+            items.extend(
                 schemas.SessionTurn(
-                    turn_id=t.id,
-                    seq=t.seq,
-                    created_at=t.created_at,
-                    user_text=t.user_text or "",
-                    reply_text=t.reply_text or "",
-                    user_audio_url=user_audio_url,
-                    reply_audio_url=reply_audio_url,
-                    risk_flag=int(bool(getattr(t, "risk_flag", False))),
-                    risk_source=getattr(t, "risk_source", None),
-                    risk_reason=getattr(t, "risk_reason", None),
+                    turn_id=r.id,
+                    seq=r.seq,
+                    created_at=r.created_at,
+                    user_text=r.user_text or "",
+                    reply_text=r.reply_text or "",
+                    user_audio_url=urls[r.user_audio_path] if r.user_audio_path else None,
+                    reply_audio_url=urls[r.reply_audio_path] if r.reply_audio_path else None,
+                    risk_flag=int(bool(r.risk_flag)),
+                    risk_source=r.risk_source,
+                    risk_reason=r.risk_reason,
                 )
+                for r in rows
             )
 
         return schemas.SessionDetail(
             session_id=session.id,
             child_id=session.child_id,
-            device_sn=device_sn,
+            device_sn=session.device_sn or "",
             start_time=session.started_at,
             end_time=session.ended_at,
             turns=items,
@@ -4,25 +4,42 @@
 
 from __future__ import annotations
 
+import re
 from typing import List
 
+from sqlalchemy import bindparam, select
 from sqlalchemy.orm import Session
 
+from app.application.auth.usecase import CurrentParent
 from app.common.errors import BadRequestError, ForbiddenError, NotFoundError
 from app.domain import models, schemas
+from app.infra.db import safe_select
+
+
+# 热点查询在模块加载时构造一次，参数走 bindparam，命中 SQLAlchemy 编译缓存
+_DEVICE_BY_SN_STMT = safe_select(models.Device).where(models.Device.device_sn == bindparam("device_sn"))
+# 孩子 + 绑定设备一次取回（设备可能不存在，用外连接）
+_CHILD_WITH_DEVICE_STMT = (
+    select(models.Child, models.Device)
+    .outerjoin(models.Device, models.Device.bound_child_id == models.Child.id)
+    .where(models.Child.id == bindparam("child_id"))
+    .limit(1)
+)
+
+
+_SPLIT_RE = re.compile(r"\s*,\s*")
 
 
 def _join_list(items: List[str]) -> str:
     """把字符串列表压成逗号分隔字符串存库"""
-    cleaned = [x.strip() for x in items if x and x.strip()]
-    return ",".join(cleaned)
+    return ",".join(x for x in (i.strip() for i in items if i) if x)
 
 
 def _split_str(s: str | None) -> List[str]:
     """把逗号分隔字符串拆回列表，用于接口返回"""
     if not s:
         return []
-    return [x.strip() for x in s.split(",") if x.strip()]
+    return [x for x in _SPLIT_RE.split(s.strip()) if x]
 
 
 class ProfileUsecase:
@@ -32,7 +49,7 @@ class ProfileUsecase:
         self,
         db: Session,
         *,
-        parent: models.Parent,
+        parent: CurrentParent,
         req: schemas.ParentSetupRequest,
     ) -> schemas.ParentSetupResponse:
         # 1) 创建 child
@@ -48,11 +65,7 @@ class ProfileUsecase:
         db.flush()
 
         # 2) 设备绑定（限制：若设备已绑定到其他家长的孩子，则拒绝）
-        device = (
-            db.query(models.Device)
-            .filter(models.Device.device_sn == req.device_sn)
-            .first()
-        )
+        device = db.execute(_DEVICE_BY_SN_STMT, {"device_sn": req.device_sn}).scalar_one_or_none()
         if device is None:
             device = models.Device(
                 device_sn=req.device_sn,
@@ -84,27 +97,38 @@ class ProfileUsecase:
             if req.toy_persona is not None:
                 device.toy_persona = req.toy_persona
 
+        # id 已在 flush/commit 时回填，且 expire_on_commit=False，无需 refresh 重读
         db.commit()
-        db.refresh(child)
-        db.refresh(device)
 
         return schemas.ParentSetupResponse(parent_id=parent.id, child_id=child.id, device_id=device.id)
 
-    def get_child_profile(self, db: Session, *, parent: models.Parent, child_id: int) -> schemas.ChildProfile:
-        child = db.get(models.Child, child_id)
-        if child is None:
+    def get_child_profile(self, db: Session, *, parent: CurrentParent, child_id: int) -> schemas.ChildProfile:
+        child, device = self._load_child_and_device(db, parent=parent, child_id=child_id)
+        if device is None:
+            raise NotFoundError(code="DEVICE_NOT_FOUND", message="device not found for child")
+        return self._to_child_profile(parent, child, device)
+
+    def _load_child_and_device(
+        self,
+        db: Session,
+        *,
+        parent: CurrentParent,
+        child_id: int,
+    ) -> tuple[models.Child, models.Device | None]:
+        row = db.execute(_CHILD_WITH_DEVICE_STMT, {"child_id": child_id}).one_or_none()
+        if row is None:
             raise NotFoundError(code="CHILD_NOT_FOUND", message="child not found")
+        child, device = row
         if child.parent_id != parent.id:
             raise ForbiddenError(code="CHILD_FORBIDDEN", message="child not belongs to current parent")
+        return child, device
 
-        device = (
-            db.query(models.Device)
-            .filter(models.Device.bound_child_id == child.id)
-            .first()
-        )
-        if device is None:
-            raise NotFoundError(code="DEVICE_NOT_FOUND", message="device not found for child")
-
+    def _to_child_profile(
+        self,
+        parent: CurrentParent,
+        child: models.Child,
+        device: models.Device,
+    ) -> schemas.ChildProfile:
         return schemas.ChildProfile(
             parent_id=parent.id,
             parent_phone=parent.phone,
@@ -127,21 +151,11 @@ class ProfileUsecase:
         self,
         db: Session,
         *,
-        parent: models.Parent,
+        parent: CurrentParent,
         child_id: int,
         req: schemas.ChildProfileUpdateRequest,
     ) -> schemas.ChildProfile:
-        child = db.get(models.Child, child_id)
-        if child is None:
-            raise NotFoundError(code="CHILD_NOT_FOUND", message="child not found")
-        if child.parent_id != parent.id:
-            raise ForbiddenError(code="CHILD_FORBIDDEN", message="child not belongs to current parent")
-
-        device = (
-            db.query(models.Device)
-            .filter(models.Device.bound_child_id == child.id)
-            .first()
-        )
+        child, device = self._load_child_and_device(db, parent=parent, child_id=child_id)
 
         if req.child_name is not None:
             child.name = req.child_name
@@ -169,4 +183,5 @@ class ProfileUsecase:
         if device is None:
             raise BadRequestError(code="DEVICE_NOT_BOUND", message="device not bound to child")
 
-        return self.get_child_profile(db, parent=parent, child_id=child_id)
+        # expire_on_commit=False：提交后对象属性仍有效，直接组装返回，无需再查一次
+        return self._to_child_profile(parent, child, device)
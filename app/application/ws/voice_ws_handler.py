@@ -14,19 +14,19 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import logging
+import threading
 import time
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+import orjson
 from fastapi import WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
 
 from app.common.trace import new_trace_id, set_trace_id
 from app.infra.db import SessionLocal
 from app.services.text_segment import segment_text_for_tts
-from app.services.voice_chat_service import VoiceChatService, _pcm_to_wav_bytes
+from app.services.voice_chat_service import VoiceChatService, _pcm_chunks_to_wav_bytes
 from app.services.vad import EndpointDetector
 from app.speech.client import SpeechClient
 from app.speech.errors import SpeechError
@@ -34,6 +34,20 @@ from app.speech.errors import SpeechError
 
 logger = logging.getLogger(__name__)
 
+# 下行音频合并帧的上限（字节）
+_AUDIO_FRAME_MAX = 16 * 1024
+
+# 可直接以纯文本发送的控制命令（不走 JSON 解析）
+_BARE_COMMANDS = frozenset({"ping", "stop", "resume"})
+
+# 打断后快照上传的防抖时长（秒）：窗口内续播则不上传
+_SNAPSHOT_DEBOUNCE_SECONDS = 0.5
+
+
+def _now_ms() -> int:
+    """单调时钟毫秒数，仅用于计算耗时（不受系统时间调整影响）"""
+    return time.monotonic_ns() // 1_000_000
+
 
 @dataclass
 class PlaybackContext:
@@ -49,60 +63,221 @@ class PlaybackContext:
     segments: List[str]
 
     seg_idx: int = 0
-    pcm_buffer: bytearray = field(default_factory=bytearray)
+    # TTS 音频按块保存，落盘时一次性拷入 WAV 缓冲区（避免 bytearray 反复扩容）
+    pcm_chunks: List[bytes] = field(default_factory=list)
+    # 本轮累积的链路指标，随状态更新一并写入（不单独落库）
+    metrics: Dict[str, Any] = field(default_factory=dict)
     resume_count: int = 0
 
     tts_started_at_ms: Optional[int] = None
     first_audio_at_ms: Optional[int] = None
 
 
-async def _safe_json_loads(s: str) -> Optional[dict]:
+def _coalesce_audio(data: bytes, outq: asyncio.Queue) -> Tuple[bytes, Optional[tuple]]:
+    """把队列里紧随其后的音频块并入 data，组成一帧下行音频
+
+    返回 (本帧, 留给下一帧的队列项)：帧长始终不超过 _AUDIO_FRAME_MAX，放不下的音频块、控制消息
+    （保持顺序）以及超长块的余下部分都作为下一帧的起点
+    """
+    if len(data) > _AUDIO_FRAME_MAX:
+        return data[:_AUDIO_FRAME_MAX], ("b", data[_AUDIO_FRAME_MAX:])
+    if len(data) == _AUDIO_FRAME_MAX or outq.empty():
+        return data, None
+
+    buf = bytearray(data)
+    while not outq.empty():
+        item = outq.get_nowait()
+        if item[0] != "b" or len(buf) + len(item[1]) > _AUDIO_FRAME_MAX:
+            return bytes(buf), item
+        buf.extend(item[1])
+    return bytes(buf), None
+
+
+def _safe_json_loads(s: str) -> Optional[dict]:
     try:
-        data = json.loads(s)
-        if isinstance(data, dict):
-            return data
-        return None
-    except Exception:  # noqa: BLE001
+        data = orjson.loads(s)
+    except orjson.JSONDecodeError:
         return None
+    return data if isinstance(data, dict) else None
+
+
+def _finalize_reply_audio(
+    service: VoiceChatService,
+    turn_id: int,
+    pcm_chunks: List[bytes],
+    *,
+    reply_audio_path: str,
+    playback_status: str,
+    metrics: Dict[str, Any],
+) -> None:
+    """在工作线程中执行：WAV 封装 + 上传 + 落库（独立短 Session）"""
+    reply_wav = _pcm_chunks_to_wav_bytes(pcm_chunks)
+    with SessionLocal() as db:
+        service.finalize_turn_reply_audio(
+            db,
+            turn_id,
+            reply_wav_bytes=reply_wav,
+            playback_status=playback_status,
+            metrics=metrics,
+            reply_audio_path=reply_audio_path,
+        )
+
+
+def _update_turn_runtime(service: VoiceChatService, turn_id: int, **kwargs: Any) -> None:
+    """在工作线程中执行：更新播放态（独立短 Session，不占用事件循环）"""
+    with SessionLocal() as db:
+        service.update_turn_runtime(db, turn_id, **kwargs)
+
+
+# SpeechClient/VoiceChatService 进程内单例：所有连接共享（含连接池等），只初始化一次
+_speech_client: Optional[SpeechClient] = None
+_voice_service: Optional[VoiceChatService] = None
+_service_lock = threading.Lock()
+
+
+def _get_speech_and_service() -> Tuple[SpeechClient, VoiceChatService]:
+    global _speech_client, _voice_service
+    if _voice_service is None:
+        with _service_lock:
+            if _voice_service is None:
+                _speech_client = SpeechClient()
+                _voice_service = VoiceChatService(speech_client=_speech_client)
+    assert _speech_client is not None
+    return _speech_client, _voice_service
 
 
 class VoiceWsHandler:
-    def __init__(self) -> None:
-        # SpeechClient/LLM selector 等初始化成本相对高，这里做一次复用
-        # 但每个连接仍会独立维护播放上下文与 DB Session。
-        self._speech = None
-        self._service = None
-
-    def _get_service(self) -> VoiceChatService:
-        if self._service is not None:
-            return self._service
-        self._speech = SpeechClient()
-        self._service = VoiceChatService(speech_client=self._speech)
-        return self._service
+    """每个连接独立维护播放上下文；DB Session 按轮次/单次更新短借短还"""
 
     async def run(self, ws: WebSocket, device_sn: str) -> None:
         # WebSocket 也生成 trace_id（HTTP middleware 不覆盖 WS）
         set_trace_id(new_trace_id())
 
         await ws.accept()
-        db: Session = SessionLocal()
 
-        service = self._get_service()
-        speech = self._speech
-        assert speech is not None
+        speech, service = _get_speech_and_service()
 
         detector = EndpointDetector(sample_rate=16000)
-        send_lock = asyncio.Lock()
+
+        # 单写者：所有下行帧经有界队列由 writer 顺序发送（保证顺序、提供背压）；
+        # 连续的音频块合并成不超过 _AUDIO_FRAME_MAX 的一帧，减少帧数与发送次数
+        outq: asyncio.Queue = asyncio.Queue(maxsize=64)
+        writer_closed = False
+        # writer 已从队列取出、留到下一帧发送的项（放不下的音频块或控制消息）
+        writer_pending: Optional[tuple] = None
+
+        async def _writer_loop():
+            nonlocal writer_closed, writer_pending
+            try:
+                while True:
+                    kind, data = writer_pending if writer_pending is not None else await outq.get()
+                    writer_pending = None
+                    if kind == "j":
+                        await ws.send_text(data)
+                        continue
+
+                    frame, writer_pending = _coalesce_audio(data, outq)
+                    await ws.send_bytes(frame)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa: BLE001
+                logger.info("ws writer stopped: device_sn=%s", device_sn)
+            finally:
+                writer_closed = True
+                # 唤醒可能阻塞在 put 上的生产者
+                while not outq.empty():
+                    outq.get_nowait()
+
+        writer_task = asyncio.create_task(_writer_loop())
+
+        async def _enqueue(item) -> None:
+            if writer_closed:
+                raise WebSocketDisconnect(1006)
+            await outq.put(item)
 
         async def send_json(payload: Dict[str, Any]):
-            async with send_lock:
-                await ws.send_json(payload)
+            await _enqueue(("j", orjson.dumps(payload).decode("utf-8")))
 
         async def send_bytes(data: bytes):
-            async with send_lock:
-                await ws.send_bytes(data)
+            await _enqueue(("b", data))
+
+        def drop_queued_audio() -> None:
+            # 打断时丢弃尚未发出的音频（含 writer 留到下一帧的音频块），控制消息保持原顺序
+            nonlocal writer_pending
+            if writer_pending is not None and writer_pending[0] == "b":
+                writer_pending = None
+            kept = []
+            while not outq.empty():
+                item = outq.get_nowait()
+                if item[0] != "b":
+                    kept.append(item)
+            for item in kept:
+                outq.put_nowait(item)
+
+        # 后台落库任务：连接结束时统一等待，避免断连丢数据
+        background_tasks: set = set()
+
+        def run_in_background(fn, *args: Any, **kwargs: Any) -> asyncio.Task:
+            async def _job():
+                try:
+                    await asyncio.to_thread(fn, *args, **kwargs)
+                except Exception:  # noqa: BLE001
+                    logger.exception("background persist failed: %s", getattr(fn, "__name__", fn))
+
+            task = asyncio.create_task(_job())
+            background_tasks.add(task)
+            task.add_done_callback(background_tasks.discard)
+            return task
+
+        # 打断快照（延迟上传）：(debounce task, turn_id, 后台任务参数)
+        pending_snapshot: Optional[tuple] = None
+        # 已开始上传的快照：turn_id -> 后台任务；续播前须等它落库，否则它可能晚于续播后的完整音频写入而覆盖之
+        snapshot_jobs: Dict[int, asyncio.Task] = {}
 
-        current_pcm = bytearray()
+        def flush_snapshot() -> None:
+            nonlocal pending_snapshot
+            if pending_snapshot is None:
+                return
+            task, turn_id, chunks, kwargs = pending_snapshot
+            pending_snapshot = None
+            if task is not asyncio.current_task():
+                task.cancel()
+            job = run_in_background(_finalize_reply_audio, service, turn_id, chunks, **kwargs)
+            snapshot_jobs[turn_id] = job
+
+            def _done(_: asyncio.Task) -> None:
+                if snapshot_jobs.get(turn_id) is job:
+                    del snapshot_jobs[turn_id]
+
+            job.add_done_callback(_done)
+
+        async def cancel_snapshot(turn_id: int) -> None:
+            nonlocal pending_snapshot
+            if pending_snapshot is not None and pending_snapshot[1] == turn_id:
+                pending_snapshot[0].cancel()
+                pending_snapshot = None
+            # 防抖已过、快照已在上传：等它完成（asyncio.wait 不会因本协程被取消而取消该任务）
+            job = snapshot_jobs.get(turn_id)
+            if job is not None:
+                await asyncio.wait((job,))
+
+        def schedule_snapshot(ctx: PlaybackContext, metrics: Dict[str, Any]) -> None:
+            nonlocal pending_snapshot
+            flush_snapshot()
+
+            async def _later():
+                await asyncio.sleep(_SNAPSHOT_DEBOUNCE_SECONDS)
+                flush_snapshot()
+
+            kwargs = {
+                "reply_audio_path": ctx.reply_audio_path,
+                "playback_status": "interrupted",
+                "metrics": metrics,
+            }
+            pending_snapshot = (asyncio.create_task(_later()), ctx.turn_id, list(ctx.pcm_chunks), kwargs)
+
+        # 本句上行音频按帧保存，句末一次性拷入 WAV 缓冲区（避免 bytearray 反复扩容）
+        current_pcm: List[bytes] = []
         in_speech = False
 
         playback_ctx: Optional[PlaybackContext] = None
@@ -115,6 +290,7 @@ class VoiceWsHandler:
                 return
             if playback_cancel is not None and not playback_cancel.is_set():
                 playback_cancel.set()
+            drop_queued_audio()
             await send_json({
                 "type": "interrupt_requested",
                 "reason": reason,
@@ -135,10 +311,12 @@ class VoiceWsHandler:
             playback_cancel = asyncio.Event()
 
             if is_resume:
+                await cancel_snapshot(ctx.turn_id)
                 ctx.resume_count += 1
                 try:
-                    service.update_turn_runtime(
-                        db,
+                    await asyncio.to_thread(
+                        _update_turn_runtime,
+                        service,
                         ctx.turn_id,
                         playback_status="speaking",
                         resume_count=ctx.resume_count,
@@ -152,12 +330,15 @@ class VoiceWsHandler:
                     "seg_idx": ctx.seg_idx,
                 })
             else:
+                # 新一轮：生成阶段指标与 speaking 状态合并为一次 UPDATE
                 try:
-                    service.update_turn_runtime(
-                        db,
+                    await asyncio.to_thread(
+                        _update_turn_runtime,
+                        service,
                         ctx.turn_id,
                         playback_status="speaking",
                         resume_count=ctx.resume_count,
+                        metrics=ctx.metrics,
                     )
                 except Exception:  # noqa: BLE001
                     logger.exception("update_turn_runtime failed")
@@ -177,7 +358,7 @@ class VoiceWsHandler:
                 cancel_event = playback_cancel
                 assert cancel_event is not None
 
-                ctx.tts_started_at_ms = int(time.time() * 1000)
+                ctx.tts_started_at_ms = _now_ms()
                 await send_json({"type": "tts_start", "turn_id": ctx.turn_id})
 
                 try:
@@ -190,8 +371,8 @@ class VoiceWsHandler:
                             if not chunk:
                                 continue
                             if ctx.first_audio_at_ms is None:
-                                ctx.first_audio_at_ms = int(time.time() * 1000)
-                            ctx.pcm_buffer.extend(chunk)
+                                ctx.first_audio_at_ms = _now_ms()
+                            ctx.pcm_chunks.append(chunk)
                             await send_bytes(chunk)
 
                         if cancel_event.is_set():
@@ -207,51 +388,46 @@ class VoiceWsHandler:
                         })
                         try:
                             snap_metrics = {
+                                **ctx.metrics,
                                 "seg_idx": ctx.seg_idx,
                                 "resume_count": ctx.resume_count,
                                 "seg_count": len(ctx.segments),
                                 "snapshot": True,
                             }
-                            if ctx.pcm_buffer:
-                                snap_wav = _pcm_to_wav_bytes(bytes(ctx.pcm_buffer))
-                                service.finalize_turn_reply_audio(
-                                    db,
-                                    ctx.turn_id,
-                                    reply_wav_bytes=snap_wav,
-                                    playback_status="interrupted",
-                                    metrics=snap_metrics,
-                                )
-                            else:
-                                service.update_turn_runtime(
-                                    db,
-                                    ctx.turn_id,
-                                    playback_status="interrupted",
-                                    resume_count=ctx.resume_count,
-                                    metrics=snap_metrics,
-                                )
+                            # 状态立即落库；已播音频的快照延迟上传，期间若续播则取消（续播结束会上传完整音频）
+                            await asyncio.to_thread(
+                                _update_turn_runtime,
+                                service,
+                                ctx.turn_id,
+                                playback_status="interrupted",
+                                resume_count=ctx.resume_count,
+                                metrics=snap_metrics,
+                            )
+                            if ctx.pcm_chunks:
+                                schedule_snapshot(ctx, snap_metrics)
                         except Exception:  # noqa: BLE001
                             logger.exception("interrupted snapshot failed")
                         return
 
-                    reply_wav = _pcm_to_wav_bytes(bytes(ctx.pcm_buffer))
                     metrics = {
+                        **ctx.metrics,
                         "seg_count": len(ctx.segments),
                         "resume_count": ctx.resume_count,
-                        "tts_ms": (int(time.time() * 1000) - (ctx.tts_started_at_ms or int(time.time() * 1000))),
+                        "tts_ms": (_now_ms() - (ctx.tts_started_at_ms or _now_ms())),
                         "ttft_ms": None
                         if ctx.first_audio_at_ms is None
                         else (ctx.first_audio_at_ms - (ctx.tts_started_at_ms or ctx.first_audio_at_ms)),
                     }
-                    try:
-                        service.finalize_turn_reply_audio(
-                            db,
-                            ctx.turn_id,
-                            reply_wav_bytes=reply_wav,
-                            playback_status="completed",
-                            metrics=metrics,
-                        )
-                    except Exception:  # noqa: BLE001
-                        logger.exception("finalize_turn_reply_audio failed")
+                    # 音频封装/上传/落库放到后台，先通知客户端本轮结束（不等 S3 PUT）
+                    run_in_background(
+                        _finalize_reply_audio,
+                        service,
+                        ctx.turn_id,
+                        list(ctx.pcm_chunks),
+                        reply_audio_path=ctx.reply_audio_path,
+                        playback_status="completed",
+                        metrics=metrics,
+                    )
 
                     await send_json({
                         "type": "turn_end",
@@ -269,7 +445,9 @@ class VoiceWsHandler:
                     logger.exception("playback runner failed")
                     try:
                         if playback_ctx is not None:
-                            service.update_turn_runtime(db, playback_ctx.turn_id, playback_status="error")
+                            await asyncio.to_thread(
+                                _update_turn_runtime, service, playback_ctx.turn_id, playback_status="error"
+                            )
                     except Exception:  # noqa: BLE001
                         pass
                     await send_json({"type": "error", "message": "playback_failed"})
@@ -282,38 +460,10 @@ class VoiceWsHandler:
             while True:
                 msg = await ws.receive()
 
-                if msg.get("text") is not None:
-                    text = msg["text"]
-
-                    if text in ("ping", "stop", "resume"):
-                        data = {"type": text}
-                    else:
-                        data = await _safe_json_loads(text)
-                        if not data:
-                            logger.info("ignore invalid control msg: %s", text[:200])
-                            continue
-
-                    mtype = data.get("type")
-
-                    if mtype == "ping":
-                        await send_json({"type": "pong"})
-                        continue
-                    if mtype == "resume":
-                        if playback_ctx is None:
-                            await send_json({"type": "resume_rejected", "reason": "no_pending"})
-                            continue
-                        if playback_task is not None and not playback_task.done():
-                            await send_json({"type": "resume_rejected", "reason": "already_speaking"})
-                            continue
-                        await start_playback(playback_ctx, is_resume=True)
-                        continue
-                    if mtype == "stop":
-                        await interrupt_playback(reason="user_stop")
-                        continue
-
-                    logger.info("ignore unknown control type: %s", mtype)
-                    continue
+                if msg["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(msg.get("code", 1000))
 
+                # 音频帧（二进制）是高频路径，优先判断；控制帧（文本）频率低
                 if msg.get("bytes") is not None:
                     chunk = msg["bytes"]
 
@@ -321,22 +471,24 @@ class VoiceWsHandler:
 
                     if start and not in_speech:
                         in_speech = True
-                        current_pcm = bytearray()
+                        current_pcm = []
                         await send_json({"type": "speech_start"})
 
                         await interrupt_playback(reason="barge_in")
 
                     if in_speech:
-                        current_pcm.extend(chunk)
+                        current_pcm.append(chunk)
 
                     if end and in_speech:
                         in_speech = False
                         await send_json({"type": "speech_end"})
 
-                        wav_bytes = _pcm_to_wav_bytes(bytes(current_pcm))
-                        t0 = int(time.time() * 1000)
+                        wav_bytes = _pcm_chunks_to_wav_bytes(current_pcm)
+                        t0 = _now_ms()
                         try:
-                            draft = await service.prepare_turn(db, device_sn, wav_bytes)
+                            # 每轮一个短 Session：连接只在本轮读写期间占用，播报期间不持有
+                            with SessionLocal() as db:
+                                draft = await service.prepare_turn(db, device_sn, wav_bytes)
                         except SpeechError as e:
                             logger.error("turn failed: %s", e)
                             await send_json({"type": "error", "message": f"speech_error: {str(e)}"})
@@ -359,26 +511,53 @@ class VoiceWsHandler:
                             segments=segs,
                         )
 
-                        try:
-                            service.update_turn_runtime(
-                                db,
-                                draft.turn_id,
-                                playback_status="pending",
-                                metrics={
-                                    "gen_ms": int(time.time() * 1000) - t0,
-                                    "seg_count": len(segs),
-                                },
-                            )
-                        except Exception:  # noqa: BLE001
-                            logger.exception("update_turn_runtime failed")
+                        ctx.metrics = {
+                            "gen_ms": _now_ms() - t0,
+                            "seg_count": len(segs),
+                        }
 
                         await start_playback(ctx, is_resume=False)
 
                     continue
 
+                if msg.get("text") is not None:
+                    text = msg["text"]
+
+                    if text in _BARE_COMMANDS:
+                        data = {"type": text}
+                    else:
+                        data = _safe_json_loads(text)
+                        if not data:
+                            logger.info("ignore invalid control msg: %s", text[:200])
+                            continue
+
+                    mtype = data.get("type")
+
+                    if mtype == "ping":
+                        await send_json({"type": "pong"})
+                        continue
+                    if mtype == "resume":
+                        if playback_ctx is None:
+                            await send_json({"type": "resume_rejected", "reason": "no_pending"})
+                            continue
+                        if playback_task is not None and not playback_task.done():
+                            await send_json({"type": "resume_rejected", "reason": "already_speaking"})
+                            continue
+                        await start_playback(playback_ctx, is_resume=True)
+                        continue
+                    if mtype == "stop":
+                        await interrupt_playback(reason="user_stop")
+                        continue
+
+                    logger.info("ignore unknown control type: %s", mtype)
+                    continue
+
         except WebSocketDisconnect:
             logger.info("WebSocket disconnected: device_sn=%s", device_sn)
             if playback_cancel is not None:
                 playback_cancel.set()
         finally:
-            db.close()
+            writer_task.cancel()
+            flush_snapshot()
+            if background_tasks:
+                await asyncio.gather(*background_tasks, return_exceptions=True)
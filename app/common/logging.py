@@ -9,10 +9,19 @@ import logging
 from app.common.trace import get_trace_id
 
 
-class TraceIdFilter(logging.Filter):
-    def filter(self, record: logging.LogRecord) -> bool:  # noqa: A003
-        setattr(record, "trace_id", get_trace_id())
-        return True
+def _install_trace_id_record_factory() -> None:
+    """ 在 LogRecord 创建时写入 trace_id：每条日志只读一次 ContextVar（Filter 会按 handler 个数重复执行） """
+    base_factory = logging.getLogRecordFactory()
+    if getattr(base_factory, "_with_trace_id", False):
+        return
+
+    def factory(*args, **kwargs) -> logging.LogRecord:
+        record = base_factory(*args, **kwargs)
+        record.trace_id = get_trace_id()
+        return record
+
+    factory._with_trace_id = True  # type: ignore[attr-defined]
+    logging.setLogRecordFactory(factory)
 
 
 def setup_logging(level: int = logging.INFO) -> None:
@@ -30,8 +39,4 @@ def setup_logging(level: int = logging.INFO) -> None:
         handler.setFormatter(formatter)
         root.addHandler(handler)
 
-    # 给现有 handler 全部加 filter
-    for h in root.handlers:
-        has_filter = any(isinstance(f, TraceIdFilter) for f in getattr(h, "filters", []))
-        if not has_filter:
-            h.addFilter(TraceIdFilter())
+    _install_trace_id_record_factory()
@@ -4,19 +4,34 @@
 
 from __future__ import annotations
 
-from typing import Callable
-
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.common.trace import new_trace_id, set_trace_id
 
 
-class TraceIdMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        trace_id = request.headers.get("X-Request-Id") or new_trace_id()
+class TraceIdMiddleware:
+    """纯 ASGI 中间件：不走 BaseHTTPMiddleware，避免每个请求额外的 task group / 内存流"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = ""
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                trace_id = value.decode("latin-1")
+                break
+        trace_id = trace_id or new_trace_id()
         set_trace_id(trace_id)
-        response: Response = await call_next(request)
-        response.headers["X-Trace-Id"] = trace_id
-        return response
+        trace_header = (b"x-trace-id", trace_id.encode("latin-1"))
+
+        async def send_with_trace_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), trace_header]
+            await send(message)
+
+        await self.app(scope, receive, send_with_trace_id)
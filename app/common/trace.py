@@ -4,7 +4,7 @@
 
 from __future__ import annotations
 
-import uuid
+import secrets
 from contextvars import ContextVar
 
 
@@ -12,12 +12,14 @@ _trace_id_ctx: ContextVar[str] = ContextVar("trace_id", default="-")
 
 
 def new_trace_id() -> str:
-    return uuid.uuid4().hex
+    # 32 位十六进制：直接对 16 字节随机数编码，不构造 UUID 对象
+    return secrets.token_hex(16)
 
 
 def set_trace_id(trace_id: str) -> None:
-    _trace_id_ctx.set(trace_id or "-")
+    """调用方保证非空（HTTP 中间件 / WS 入口均已兜底生成）"""
+    _trace_id_ctx.set(trace_id)
 
 
 def get_trace_id() -> str:
-    return _trace_id_ctx.get() or "-"
+    return _trace_id_ctx.get()
@@ -7,14 +7,39 @@ from __future__ import annotations
 import time
 from typing import List, Optional
 
-from sqlalchemy import BigInteger, Boolean, ForeignKey, Integer, String, Text
+from sqlalchemy import BINARY, BigInteger, Boolean, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.sql.expression import FunctionElement
 
 from app.infra.db import Base
 
 
 def _ts() -> int:
-    return int(time.time())
+    # 整数纳秒直接整除，省去 float 转换
+    return time.time_ns() // 1_000_000_000
+
+
+class _unix_now(FunctionElement):
+    """当前 Unix 秒（由数据库计算）：用作 onupdate，UPDATE 时内联进 SET 子句，flush 不再逐行调用 Python"""
+
+    type = BigInteger()
+    inherit_cache = True
+
+
+@compiles(_unix_now)
+def _compile_unix_now(element, compiler, **kw) -> str:  # noqa: ARG001
+    return "UNIX_TIMESTAMP()"
+
+
+@compiles(_unix_now, "sqlite")
+def _compile_unix_now_sqlite(element, compiler, **kw) -> str:  # noqa: ARG001
+    return "CAST(strftime('%s', 'now') AS INTEGER)"
+
+
+# 关系加载策略：业务查询均显式 select 所需列/对象，不经由关系属性导航。
+# 会随时间无限增长的集合（会话、轮次、登录会话）及 Turn 的外键关系设为 raise_on_sql，
+# 误用触发隐式懒加载（N+1）时直接报错，而不是静默逐行查询。
 
 
 class Parent(Base):
@@ -30,7 +55,7 @@ class Parent(Base):
         BigInteger,
         nullable=True,
         default=None,
-        onupdate=_ts,
+        onupdate=_unix_now(),
     )
 
     children: Mapped[List["Child"]] = relationship(
@@ -43,6 +68,7 @@ class Parent(Base):
         "AuthSession",
         back_populates="parent",
         cascade="all, delete-orphan",
+        lazy="raise_on_sql",
     )
 
 
@@ -57,7 +83,9 @@ class AuthSession(Base):
         index=True,
     )
 
-    token_hash: Mapped[str] = mapped_column(String(64), nullable=False, unique=True, index=True)
+    # refresh_token 的 SHA-256 原始字节；按 16 字节前缀建索引查询，再比对完整摘要
+    token_hash: Mapped[bytes] = mapped_column(BINARY(32), nullable=False)
+    token_prefix: Mapped[bytes] = mapped_column(BINARY(16), nullable=False, index=True)
 
     created_at: Mapped[int] = mapped_column(BigInteger, nullable=False, default=_ts)
     expires_at: Mapped[int] = mapped_column(BigInteger, nullable=False)
@@ -101,7 +129,7 @@ class Child(Base):
         BigInteger,
         nullable=True,
         default=None,
-        onupdate=_ts,
+        onupdate=_unix_now(),
     )
 
     parent: Mapped["Parent"] = relationship("Parent", back_populates="children")
@@ -109,6 +137,7 @@ class Child(Base):
         "ChatSession",
         back_populates="child",
         cascade="all, delete-orphan",
+        lazy="raise_on_sql",
     )
 
     device: Mapped[Optional["Device"]] = relationship(
@@ -142,7 +171,7 @@ class Device(Base):
         BigInteger,
         nullable=True,
         default=None,
-        onupdate=_ts,
+        onupdate=_unix_now(),
     )
     last_seen_at: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True, default=None)
 
@@ -151,7 +180,7 @@ class Device(Base):
         primaryjoin="Device.bound_child_id==Child.id",
         viewonly=True,
     )
-    turns: Mapped[List["Turn"]] = relationship("Turn", back_populates="device")
+    turns: Mapped[List["Turn"]] = relationship("Turn", back_populates="device", lazy="raise_on_sql")
 
 
 class ChatSession(Base):
@@ -169,6 +198,8 @@ class ChatSession(Base):
 
     started_at: Mapped[int] = mapped_column(BigInteger, nullable=False, default=_ts)
     ended_at: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True, default=None)
+    # 会话内最新一轮的 seq：与 Turn 同一事务写入，下一轮 seq 直接取 last_seq + 1，免 MAX(seq) 查询
+    last_seq: Mapped[int] = mapped_column(Integer, nullable=False, default=0, doc="最新轮次序号")
 
     child: Mapped["Child"] = relationship("Child", back_populates="sessions")
     turns: Mapped[List["Turn"]] = relationship(
@@ -176,18 +207,20 @@ class ChatSession(Base):
         back_populates="session",
         order_by="Turn.seq",
         cascade="all, delete-orphan",
+        lazy="raise_on_sql",
     )
 
 
 class Turn(Base):
     __tablename__ = "turns"
+    # 会话内按 seq 取轮次（详情、首轮、最大 seq）走该索引，免排序；同时覆盖 session_id 外键
+    __table_args__ = (Index("ix_turns_session_seq", "session_id", "seq"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     session_id: Mapped[int] = mapped_column(
         Integer,
         ForeignKey("chat_sessions.id"),
         nullable=False,
-        index=True,
     )
     device_id: Mapped[int] = mapped_column(
         Integer,
@@ -209,7 +242,7 @@ class Turn(Base):
         BigInteger,
         nullable=True,
         default=None,
-        onupdate=_ts,
+        onupdate=_unix_now(),
     )
 
     playback_status: Mapped[Optional[str]] = mapped_column(
@@ -228,5 +261,5 @@ class Turn(Base):
     risk_source: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)
     risk_reason: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
 
-    session: Mapped["ChatSession"] = relationship("ChatSession", back_populates="turns")
-    device: Mapped["Device"] = relationship("Device", back_populates="turns")
+    session: Mapped["ChatSession"] = relationship("ChatSession", back_populates="turns", lazy="raise_on_sql")
+    device: Mapped["Device"] = relationship("Device", back_populates="turns", lazy="raise_on_sql")
@@ -5,7 +5,8 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Iterable, List, Optional, Set
+from functools import lru_cache
+from typing import FrozenSet, Iterable, List, Optional, Tuple
 
 
 @dataclass
@@ -26,7 +27,7 @@ class SafetyViolation(Exception):
 
 
 # 基础敏感词
-_BASE_CHILD_INPUT_FORBIDDEN: Set[str] = {
+_BASE_CHILD_INPUT_FORBIDDEN: FrozenSet[str] = frozenset({
     "暴力",
     "打人",
     "杀人",
@@ -37,9 +38,9 @@ _BASE_CHILD_INPUT_FORBIDDEN: Set[str] = {
     "黄色",
     "色情",
     "毒品",
-}
+})
 
-_BASE_MODEL_REPLY_FORBIDDEN: Set[str] = {
+_BASE_MODEL_REPLY_FORBIDDEN: FrozenSet[str] = frozenset({
     "自杀",
     "自残",
     "杀死",
@@ -47,26 +48,27 @@ _BASE_MODEL_REPLY_FORBIDDEN: Set[str] = {
     "色情",
     "暴力",
     "伤害",
-}
+})
 
 
 def _normalize(text: str) -> str:
     return text.strip()
 
 
-def _merge_forbidden(base: Set[str], extra: Optional[Iterable[str]]) -> Set[str]:
+def _merge_forbidden(base: FrozenSet[str], extra: Optional[Iterable[str]]) -> FrozenSet[str]:
     """
     合并基础敏感词 + 家长自定义禁止话题
     extra 可以为 None
     """
     if not extra:
         return base
-    merged = set(base)
-    for w in extra:
-        w = (w or "").strip()
-        if w:
-            merged.add(w)
-    return merged
+    return _merge_forbidden_cached(base, tuple(extra))
+
+
+@lru_cache(maxsize=1024)
+def _merge_forbidden_cached(base: FrozenSet[str], extra: Tuple[str, ...]) -> FrozenSet[str]:
+    # 同一孩子的禁止话题每轮不变，合并结果按 (base, extra) 缓存
+    return base | {w for w in ((w or "").strip() for w in extra) if w}
 
 
 def _find_forbidden(text: str, words: Iterable[str]) -> List[str]:
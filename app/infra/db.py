@@ -4,21 +4,49 @@
 
 from __future__ import annotations
 
-from typing import Generator
+from typing import Any, Dict, Generator
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+from sqlalchemy import Select, create_engine, make_url, select, text
+from sqlalchemy.orm import DeclarativeBase, Session, raiseload, selectinload, sessionmaker
 
 from app.infra.config import settings
+from app.infra.ylogger import ylogger
 
 
 class Base(DeclarativeBase):
     """SQLAlchemy ORM 基类"""
 
 
+def _connect_args(url: str) -> Dict[str, Any]:
+    """驱动级超时（仅 MySQL/pymysql 支持这些参数）"""
+    if make_url(url).get_backend_name() != "mysql":
+        return {}
+    return {
+        "connect_timeout": settings.DB_CONNECT_TIMEOUT,
+        "read_timeout": settings.DB_READ_TIMEOUT,
+        "write_timeout": settings.DB_WRITE_TIMEOUT,
+    }
+
+
+def _pool_args(url: str) -> Dict[str, Any]:
+    """连接池参数（仅 MySQL 的 QueuePool 需要；sqlite 内存库等用的池不接受这些参数）"""
+    if make_url(url).get_backend_name() != "mysql":
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        # LIFO：优先复用最近归还的连接，低峰期多余连接自然闲置被回收，热连接保持少量常驻
+        "pool_use_lifo": True,
+    }
+
+
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
+    connect_args=_connect_args(settings.DATABASE_URL),
+    **_pool_args(settings.DATABASE_URL),
     future=True,
     echo=False,
 )
@@ -44,3 +72,26 @@ def get_db() -> Generator[Session, None, None]:
 def get_session() -> Session:
     """脚本/工具使用：手动获取一个 Session"""
     return SessionLocal()
+
+
+def safe_select(model: Any, *loads: Any) -> Select:
+    """
+    select(model)，仅对 loads 中列出的关系做 selectinload，其余关系一律 raiseload：
+    访问未声明的关系直接报错，避免隐式懒加载退化成 N+1
+    """
+    return select(model).options(*(selectinload(rel) for rel in loads), raiseload("*"))
+
+
+def warmup_pool(n: int) -> None:
+    """启动时预先建立 n 条连接并放回连接池，避免首批请求承担建连开销"""
+    conns = []
+    try:
+        for _ in range(max(n, 0)):
+            conn = engine.connect()
+            conn.execute(text("SELECT 1"))
+            conns.append(conn)
+    except Exception as e:  # noqa: BLE001
+        ylogger.warning("DB pool warmup failed after %s connections: %s", len(conns), e)
+    finally:
+        for conn in conns:
+            conn.close()
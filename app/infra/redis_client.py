@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# @Author: yaccii
+# @Description:
+
+"""Redis 客户端（可选）
+
+注意：
+- 未配置 REDIS_URL 时 get_redis() 返回 None，调用方回退到进程内实现（仅适合单进程/开发环境）。
+- 多 worker 部署时应配置 Redis，保证验证码等状态在进程间共享。
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import redis
+
+from app.infra.config import settings
+
+
+_redis_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> Optional[redis.Redis]:
+    global _redis_client
+    if _redis_client is not None:
+        return _redis_client
+
+    if not settings.REDIS_URL:
+        return None
+
+    _redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis_client
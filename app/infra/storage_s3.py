@@ -11,27 +11,33 @@ from __future__ import annotations
 - 如果未配置 S3 相关参数，调用 upload/build_url 时会抛出明确错误。
 """
 
+import asyncio
+import contextvars
+import logging
 import os
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, TypeVar
 
 import boto3
 from botocore.client import Config
 
 from app.common.errors import BadRequestError
-from app.infra.config import settings
+from app.infra.config import S3_BASE_URL, S3_BUCKET, S3_ENABLED, settings
 from app.infra.ylogger import ylogger
 
 
 _s3_client: Optional[object] = None
 
+# 上传专用线程池：S3 PUT 耗时长，不与默认线程池中的其他阻塞调用争抢
+_s3_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="s3")
 
-def _use_s3() -> bool:
-    return bool(
-        settings.AWS_ACCESS_KEY_ID
-        and settings.AWS_SECRET_ACCESS_KEY
-        and settings.AWS_S3_BUCKET
-        and settings.AWS_S3_BASE_URL
-    )
+_T = TypeVar("_T")
+
+_USE_S3 = S3_ENABLED
+_BUCKET = S3_BUCKET
+# local file served by FastAPI StaticFiles
+_URL_PREFIX = S3_BASE_URL + "/" if _USE_S3 else "/files/"
+_LOCAL_BASE = settings.FILE_BASE_PATH or "./data"
 
 
 def _get_s3():
@@ -39,7 +45,7 @@ def _get_s3():
     if _s3_client is not None:
         return _s3_client
 
-    if not _use_s3():
+    if not _USE_S3:
         raise BadRequestError(
             code="S3_NOT_CONFIGURED",
             message="S3 storage not configured",
@@ -59,14 +65,22 @@ def _get_s3():
     return _s3_client
 
 
+def warmup() -> None:
+    """启动时预先创建 S3 client，避免首个上传请求承担初始化开销；未配置 S3 时不做任何事"""
+    if _USE_S3:
+        _get_s3()
+
+
 def upload_bytes(key: str, data: bytes, content_type: str = "audio/wav") -> None:
-    key = key.lstrip("/")
+    if key[:1] == "/":
+        key = key.lstrip("/")
 
-    if _use_s3():
+    if _USE_S3:
         s3 = _get_s3()
-        ylogger.info("Upload to S3: bucket=%s, key=%s, size=%s", settings.AWS_S3_BUCKET, key, len(data))
+        if ylogger.isEnabledFor(logging.INFO):
+            ylogger.info("Upload to S3: bucket=%s, key=%s, size=%s", _BUCKET, key, len(data))
         s3.put_object(
-            Bucket=settings.AWS_S3_BUCKET,
+            Bucket=_BUCKET,
             Key=key,
             Body=data,
             ContentType=content_type,
@@ -74,19 +88,30 @@ def upload_bytes(key: str, data: bytes, content_type: str = "audio/wav") -> None
         return
 
     # fallback: local file
-    base = settings.FILE_BASE_PATH or "./data"
-    dst = os.path.join(base, key)
+    dst = os.path.join(_LOCAL_BASE, key)
     os.makedirs(os.path.dirname(dst), exist_ok=True)
     with open(dst, "wb") as f:
         f.write(data)
-    ylogger.info("Upload to Local: path=%s size=%s", dst, len(data))
+    if ylogger.isEnabledFor(logging.INFO):
+        ylogger.info("Upload to Local: path=%s size=%s", dst, len(data))
+
+
+async def run_in_s3_executor(fn: Callable[..., _T], *args: Any) -> _T:
+    """在上传线程池中执行阻塞的存储调用；拷贝当前上下文，trace_id 等上下文变量在线程内可见"""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_s3_executor, ctx.run, fn, *args)
+
+
+async def upload_bytes_async(key: str, data: bytes, content_type: str = "audio/wav") -> None:
+    await run_in_s3_executor(upload_bytes, key, data, content_type)
 
 
 def build_url(key: str) -> str:
-    key = key.lstrip("/")
-    if _use_s3():
-        base = settings.AWS_S3_BASE_URL.rstrip("/")
-        return f"{base}/{key}"
+    # 存库的 key 通常无前导 /，常见情况下直接拼接
+    return _URL_PREFIX + (key.lstrip("/") if key[:1] == "/" else key)
+
 
-    # local file served by FastAPI StaticFiles
-    return f"/files/{key}"
+def build_urls(keys: Iterable[str]) -> Dict[str, str]:
+    """批量生成 URL，返回 key -> url"""
+    return {key: _URL_PREFIX + (key.lstrip("/") if key[:1] == "/" else key) for key in keys}
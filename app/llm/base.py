@@ -25,4 +25,5 @@ class LlmProvider(ABC):
         temperature: float = 0.8,
         extra_params: Optional[Dict[str, Any]] = None,
     ) -> str:
+        """messages 原样透传给 SDK（不做拷贝），调用期间调用方不应再修改该列表"""
         raise NotImplementedError
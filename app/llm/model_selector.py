@@ -4,22 +4,40 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Optional, Tuple
 
 from app.domain.models import Child
-from app.infra.config import settings
+from app.infra.config import LLM_DEFAULT_PROVIDER, settings
 from app.llm.base import LlmProvider
 from app.llm.registry import LlmProviderRegistry
 
 
+# 各 provider 的默认模型（settings 启动后不变，模块加载时确定）
+_DEFAULT_MODELS: Dict[str, str] = {
+    "deepseek": settings.DEEPSEEK_MODEL,
+    "openai": settings.OPENAI_MODEL,
+    "ollama": settings.OLLAMA_MODEL,
+    "dummy": "dummy",
+}
+
+# 各场景的生成参数（共享只读，调用方不要修改）
+# 语音对话通常更短、更快；如需区分可基于 task 调整
+_GEN_CONFIGS: Dict[str, Dict[str, Any]] = {
+    "voice": {"temperature": 0.7, "max_tokens": 256},
+}
+_DEFAULT_GEN_CONFIG: Dict[str, Any] = {"temperature": 0.8, "max_tokens": 256}
+
+
 class LlmModelSelector:
     """根据 child + 场景，从注册表里选择 provider + model + 生成参数"""
 
     def __init__(self, registry: LlmProviderRegistry) -> None:
         self._registry = registry
+        # 注册表与配置在启动后不变：首次选择后缓存 (provider, model_name)
+        self._selected: Optional[Tuple[LlmProvider, str]] = None
 
     def _choose_provider_name(self) -> str:
-        default_name = (settings.LLM_DEFAULT_PROVIDER or "").strip().lower() or "dummy"
+        default_name = LLM_DEFAULT_PROVIDER
         available = set(self._registry.available_providers())
 
         if default_name in available:
@@ -31,26 +49,15 @@ class LlmModelSelector:
         raise RuntimeError("没有可用的大模型 provider")
 
     def _default_model_for_provider(self, provider_name: str) -> str:
-        if provider_name == "deepseek":
-            return settings.DEEPSEEK_MODEL
-        if provider_name == "openai":
-            return settings.OPENAI_MODEL
-        if provider_name == "ollama":
-            return settings.OLLAMA_MODEL
-        if provider_name == "dummy":
-            return "dummy"
-        return "default"
+        return _DEFAULT_MODELS.get(provider_name, "default")
 
     def _default_gen_config(self, task: str) -> Dict[str, Any]:
-        # 语音对话通常更短、更快；如需区分可基于 task 调整
-        if task == "voice":
-            return {"temperature": 0.7, "max_tokens": 256}
-        return {"temperature": 0.8, "max_tokens": 256}
+        return _GEN_CONFIGS.get(task, _DEFAULT_GEN_CONFIG)
 
     def select_for_child(self, child: Child, task: str = "chat") -> Tuple[LlmProvider, str, Dict[str, Any]]:
         """返回 (provider, model_name, gen_cfg)"""
-        provider_name = self._choose_provider_name()
-        provider = self._registry.get(provider_name)
-        model_name = self._default_model_for_provider(provider_name)
-        gen_cfg = self._default_gen_config(task)
-        return provider, model_name, gen_cfg
+        if self._selected is None:
+            provider_name = self._choose_provider_name()
+            self._selected = (self._registry.get(provider_name), self._default_model_for_provider(provider_name))
+        provider, model_name = self._selected
+        return provider, model_name, self._default_gen_config(task)
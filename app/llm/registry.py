@@ -6,6 +6,8 @@ from __future__ import annotations
 
 from typing import Dict, Tuple
 
+from openai import DefaultAsyncHttpxClient
+
 from app.infra.config import settings
 from app.llm.base import LlmProvider
 from app.llm.deepseek_provider import DeepSeekProvider
@@ -17,26 +19,31 @@ from app.llm.openai_provider import OpenAIProvider
 class LlmProviderRegistry:
     def __init__(self, providers: Dict[str, LlmProvider]) -> None:
         self._providers = providers
+        # 注册表构建后不再变化，名称元组只生成一次
+        self._names: Tuple[str, ...] = tuple(providers)
 
     def get(self, name: str) -> LlmProvider:
-        if name not in self._providers:
-            raise KeyError(f"未注册的 LLM provider: {name}")
-        return self._providers[name]
+        try:
+            return self._providers[name]
+        except KeyError:
+            raise KeyError(f"未注册的 LLM provider: {name}") from None
 
     def available_providers(self) -> Tuple[str, ...]:
-        return tuple(self._providers.keys())
+        return self._names
 
 
 def build_default_registry() -> LlmProviderRegistry:
     providers: Dict[str, LlmProvider] = {"dummy": DummyProvider()}
+    # OpenAI 兼容的 provider 共用一个 HTTP 客户端（同一连接池，keep-alive 复用）
+    http_client = DefaultAsyncHttpxClient()
 
     if settings.DEEPSEEK_API_KEY:
-        providers["deepseek"] = DeepSeekProvider()
+        providers["deepseek"] = DeepSeekProvider(http_client=http_client)
 
     if settings.OPENAI_API_KEY:
-        providers["openai"] = OpenAIProvider()
+        providers["openai"] = OpenAIProvider(http_client=http_client)
 
     # 本地 Ollama 可选：不依赖 key，默认指向 http://127.0.0.1:11434/v1
-    providers["ollama"] = OllamaProvider()
+    providers["ollama"] = OllamaProvider(http_client=http_client)
 
     return LlmProviderRegistry(providers)
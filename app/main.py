@@ -4,6 +4,9 @@
 
 from __future__ import annotations
 
+from contextlib import asynccontextmanager
+
+import anyio.to_thread
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
@@ -14,13 +17,28 @@ from app.common.middlewares import TraceIdMiddleware
 from app.common.errors import AppError
 from fastapi.exceptions import RequestValidationError
 from app.infra.config import settings
+from app.infra import storage_s3
+from app.infra.db import warmup_pool
 import os
 
 setup_logging()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):  # noqa: ARG001
+    # 路由均为同步 def + 同步 Session，由线程池执行；放大默认 40 的上限，避免并发鉴权排队
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.API_THREADPOOL_SIZE
+    # 预热数据库连接池
+    warmup_pool(settings.DB_POOL_WARMUP)
+    # 预建 S3 client（未配置 S3 时为空操作）
+    storage_s3.warmup()
+    yield
+
+
 app = FastAPI(
     title="yoo-growth-buddy",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 
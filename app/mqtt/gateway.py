@@ -23,6 +23,7 @@ class MqttVoiceGateway:
     - 收到 payload: 视为 16k 单声道 16bit 的 WAV 字节
     - 调用 VoiceChatService 处理一轮对话
     - 把回复 WAV 发布到: toy/{device_sn}/voice/reply
+      （配置了 MQTT_REPLY_CHUNK_BYTES 且超出时，分片发布到 reply/part，最后一片发布到 reply/end）
     """
 
     def __init__(self) -> None:
@@ -31,6 +32,7 @@ class MqttVoiceGateway:
         self._username: Optional[str] = getattr(settings, "MQTT_USERNAME", None) or None
         self._password: Optional[str] = getattr(settings, "MQTT_PASSWORD", None) or None
         self._client_id_prefix: str = getattr(settings, "MQTT_CLIENT_ID_PREFIX", "yoo-gw-")
+        self._reply_chunk_bytes: int = int(getattr(settings, "MQTT_REPLY_CHUNK_BYTES", 0))
 
         self._client = mqtt.Client(
             client_id=f"{self._client_id_prefix}voice",
@@ -44,6 +46,8 @@ class MqttVoiceGateway:
 
         # 语音对话核心服务
         self._voice_service = VoiceChatService()
+        # 回调在 paho 网络线程中串行执行：复用同一个事件循环（LLM 异步客户端的连接池绑定在循环上）
+        self._loop = asyncio.new_event_loop()
 
     # ---------- 公开启动方法 ----------
 
@@ -85,7 +89,7 @@ class MqttVoiceGateway:
             wav_bytes: bytes = payload_bytes
             ylogger.info("Handling voice turn: device_sn=%s, wav_bytes=%s", device_sn, len(wav_bytes))
 
-            result = asyncio.run(
+            result = self._loop.run_until_complete(
                 self._voice_service.handle_turn(
                     db=db,
                     device_sn=device_sn,
@@ -95,11 +99,12 @@ class MqttVoiceGateway:
             )
 
             reply_topic = f"toy/{device_sn}/voice/reply"
-            client.publish(reply_topic, result.reply_wav_bytes)
+            n_msgs = self._publish_reply(client, reply_topic, result.reply_wav_bytes)
             ylogger.info(
-                "Published reply: topic=%s, bytes=%s, child_id=%s, session_id=%s, turn_id=%s",
+                "Published reply: topic=%s, bytes=%s, messages=%s, child_id=%s, session_id=%s, turn_id=%s",
                 reply_topic,
                 len(result.reply_wav_bytes),
+                n_msgs,
                 result.child_id,
                 result.session_id,
                 result.turn_id,
@@ -115,3 +120,21 @@ class MqttVoiceGateway:
             ylogger.exception("Failed to handle MQTT message: topic=%s, error=%s", topic, e)
         finally:
             db.close()
+
+    def _publish_reply(self, client: mqtt.Client, reply_topic: str, data: bytes) -> int:
+        """发布回复 WAV，返回发布的消息条数
+
+        未配置分片或未超出时整条发布到 reply；否则按块发布到 reply/part，最后一块发布到 reply/end，
+        终端订阅 reply/# 按序拼接（同一连接、同一订阅下 broker 按发布顺序投递）
+        """
+        size = self._reply_chunk_bytes
+        if size <= 0 or len(data) <= size:
+            client.publish(reply_topic, data)
+            return 1
+
+        last = (len(data) - 1) // size * size
+        part_topic = f"{reply_topic}/part"
+        for off in range(0, last, size):
+            client.publish(part_topic, data[off : off + size])
+        client.publish(f"{reply_topic}/end", data[last:])
+        return last // size + 1
@@ -19,7 +19,8 @@ import re
 from typing import List
 
 
-_PUNCT_SPLIT_RE = re.compile(r"([。！？!?\.\n]+)")
+_PUNCT_SPLIT_RE = re.compile(r"[。！？!?\.\n]+")
+_WS_RE = re.compile(r"\s+")
 
 
 def segment_text_for_tts(text: str, *, max_chars: int = 80, min_chars: int = 10) -> List[str]:
@@ -29,51 +30,46 @@ def segment_text_for_tts(text: str, *, max_chars: int = 80, min_chars: int = 10)
         return []
 
     # 归一化空白字符
-    s = re.sub(r"\s+", " ", s)
-
-    parts = []
-    buf = []
-
-    tokens = _PUNCT_SPLIT_RE.split(s)
-    for t in tokens:
-        if not t:
-            continue
-        if _PUNCT_SPLIT_RE.fullmatch(t):
-            # 句读符
-            buf.append(t)
-            parts.append("".join(buf).strip())
-            buf = []
-        else:
-            buf.append(t)
-            # 软切分：过长且缺少句读时先截断
-            if sum(len(x) for x in buf) >= max_chars:
-                parts.append("".join(buf).strip())
-                buf = []
-
-    if buf:
-        parts.append("".join(buf).strip())
-
-    # 合并过短分段
-    merged: List[str] = []
-    for p in parts:
-        p = p.strip()
-        if not p:
-            continue
-        if merged and len(p) < min_chars:
-            merged[-1] = (merged[-1] + " " + p).strip()
-        else:
-            merged.append(p)
+    s = _WS_RE.sub(" ", s)
 
-    # 硬切分：兜底处理仍然过长的分段
     final: List[str] = []
-    for seg in merged:
+    # 当前待定分段：后续过短分段还可能并入，确定后再做硬切分
+    pending = ""
+
+    def _flush(seg: str) -> None:
         if len(seg) <= max_chars:
             final.append(seg)
+            return
+        # 硬切分：兜底处理仍然过长的分段
+        for i in range(0, len(seg), max_chars):
+            chunk = seg[i : i + max_chars].strip()
+            if chunk:
+                final.append(chunk)
+
+    def _push(part: str) -> None:
+        nonlocal pending
+        if not part:
+            return
+        if pending and len(part) < min_chars:
+            # 合并过短分段
+            pending = pending + " " + part
+            return
+        if pending:
+            _flush(pending)
+        pending = part
+
+    # 单次扫描：按句读切分，过长且缺少句读的文本先软切分
+    start = 0
+    for m in _PUNCT_SPLIT_RE.finditer(s):
+        body = s[start : m.start()]
+        if len(body) >= max_chars:
+            _push(body.strip())
+            _push(m.group())
         else:
-            # 硬切分
-            for i in range(0, len(seg), max_chars):
-                chunk = seg[i : i + max_chars].strip()
-                if chunk:
-                    final.append(chunk)
+            _push(s[start : m.end()].strip())
+        start = m.end()
+    _push(s[start:].strip())
 
+    if pending:
+        _flush(pending)
     return final
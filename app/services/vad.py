@@ -4,18 +4,47 @@
 
 from __future__ import annotations
 
-import math
 from array import array
 from dataclasses import dataclass
-from typing import Tuple
+from operator import mul
+from typing import List, Tuple, Union
 import webrtcvad  # type: ignore
 
+try:  # 可选：EnergyVad 的向量化实现；未安装时回退到纯 Python
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore
+
+
+def _webrtc_accepts_view() -> bool:
+    """探测 webrtcvad 能否直接接收 memoryview（新版本支持 buffer 协议），能则逐帧免拷贝"""
+    if webrtcvad is None:
+        return False
+    try:
+        webrtcvad.Vad(0).is_speech(memoryview(bytes(320)), 16000)
+    except TypeError:
+        return False
+    return True
+
+
+_WEBRTC_ACCEPTS_VIEW = _webrtc_accepts_view()
+
+# 帧数据：bytes 或指向接收缓冲区的 memoryview（只在本次调用内有效，不要保存）
+PcmFrame = Union[bytes, memoryview]
+
 
 
 class BaseVad:
-    def is_speech(self, pcm16le_frame: bytes, sample_rate: int) -> bool:
+    def is_speech(self, pcm16le_frame: PcmFrame, sample_rate: int) -> bool:
         raise NotImplementedError
 
+    def is_speech_batch(self, frames: memoryview, frame_bytes: int, sample_rate: int) -> List[bool]:
+        """对连续的整帧数据逐帧判定；子类可覆盖为批量实现"""
+        return [
+            self.is_speech(frames[off:off + frame_bytes], sample_rate)
+            for off in range(0, len(frames), frame_bytes)
+        ]
+
 
 class WebRtcVad(BaseVad):
     """WebRTC VAD 封装
@@ -26,10 +55,15 @@ class WebRtcVad(BaseVad):
     def __init__(self, aggressiveness: int = 2) -> None:
         if webrtcvad is None:
             raise RuntimeError("webrtcvad not installed")
+        # 每个检测器独占一个 Vad：其内部保留噪声估计/拖尾等跨帧状态，不能在多路音频流间共享
+        # （构造本身只有亚微秒级开销，无需池化）
         self._vad = webrtcvad.Vad(int(aggressiveness))
+        self._vad_is_speech = self._vad.is_speech
 
-    def is_speech(self, pcm16le_frame: bytes, sample_rate: int) -> bool:
-        return bool(self._vad.is_speech(pcm16le_frame, sample_rate))
+    def is_speech(self, pcm16le_frame: PcmFrame, sample_rate: int) -> bool:
+        if not _WEBRTC_ACCEPTS_VIEW and isinstance(pcm16le_frame, memoryview):
+            pcm16le_frame = pcm16le_frame.tobytes()
+        return bool(self._vad_is_speech(pcm16le_frame, sample_rate))
 
 
 class EnergyVad(BaseVad):
@@ -37,19 +71,37 @@ class EnergyVad(BaseVad):
 
     def __init__(self, rms_threshold: float = 500.0) -> None:
         self._thr = float(rms_threshold)
-
-    def is_speech(self, pcm16le_frame: bytes, sample_rate: int) -> bool:
-        if not pcm16le_frame:
+        # rms >= thr  <=>  平方和 >= thr^2 * n，省去开方
+        self._thr_sq = self._thr * self._thr
+        # 帧长通常固定：按上一次的样本数缓存 thr^2 * n
+        self._n = 0
+        self._thr_n = 0.0
+
+    def is_speech(self, pcm16le_frame: PcmFrame, sample_rate: int) -> bool:
+        n = len(pcm16le_frame) // 2
+        if n == 0:
             return False
-        samples = array("h")
-        samples.frombytes(pcm16le_frame)
-        if not samples:
-            return False
-        s2 = 0.0
-        for x in samples:
-            s2 += float(x) * float(x)
-        rms = math.sqrt(s2 / len(samples))
-        return rms >= self._thr
+        if np is not None:
+            # int64 累加：单帧平方和可超出 int32 范围（320 * 32768^2）
+            x = np.frombuffer(pcm16le_frame, dtype="<i2", count=n).astype(np.int64)
+            s2 = int(np.dot(x, x))
+        else:
+            samples = array("h")
+            samples.frombytes(pcm16le_frame[: n * 2])
+            s2 = sum(map(mul, samples, samples))
+        if n != self._n:
+            self._n = n
+            self._thr_n = self._thr_sq * n
+        return s2 >= self._thr_n
+
+    def is_speech_batch(self, frames: memoryview, frame_bytes: int, sample_rate: int) -> List[bool]:
+        if np is None:
+            return super().is_speech_batch(frames, frame_bytes, sample_rate)
+        # 一次性 reshape 成 (帧数, 每帧样本数)，按行求平方和
+        spf = frame_bytes // 2
+        x = np.frombuffer(frames, dtype="<i2").reshape(-1, spf).astype(np.int64)
+        s2 = np.einsum("ij,ij->i", x, x)
+        return (s2 >= self._thr_sq * spf).tolist()
 
 
 def build_vad(
@@ -80,6 +132,22 @@ class EndpointDetector:
     将任意长度的 PCM 分片累积为固定帧长，并输出 (speech_start, speech_end) 标记
     """
 
+    # 状态机每帧读写多个计数器：固定槽位，属性访问不走实例 __dict__
+    __slots__ = (
+        "_vad",
+        "_cfg",
+        "_frame_bytes",
+        "_sr",
+        "_start_frames",
+        "_end_frames",
+        "_max_frames",
+        "_buf",
+        "_in_speech",
+        "_speech_run",
+        "_silence_run",
+        "_utter_frames",
+    )
+
     def __init__(
         self,
         sample_rate: int = 16000,
@@ -105,16 +173,24 @@ class EndpointDetector:
             max_utterance_ms=int(max_utterance_ms),
         )
 
+        cfg = self._cfg
+        # 16-bit mono
+        self._frame_bytes = int(cfg.sample_rate * (cfg.frame_ms / 1000.0)) * 2
+        # 每帧要读的配置展开成扁平整数；最长语音按帧数计（向上取整，与按毫秒比较等价）
+        self._sr = cfg.sample_rate
+        self._start_frames = cfg.speech_start_frames
+        self._end_frames = cfg.speech_end_silence_frames
+        self._max_frames = -(-cfg.max_utterance_ms // cfg.frame_ms)
+        # 只保存不足一帧的余量（< frame_bytes）
         self._buf = bytearray()
         self._in_speech = False
         self._speech_run = 0
         self._silence_run = 0
-        self._utter_ms = 0
+        self._utter_frames = 0
 
     @property
     def frame_bytes(self) -> int:
-        # 16-bit mono
-        return int(self._cfg.sample_rate * (self._cfg.frame_ms / 1000.0)) * 2
+        return self._frame_bytes
 
     @property
     def in_speech(self) -> bool:
@@ -125,15 +201,18 @@ class EndpointDetector:
         self._in_speech = False
         self._speech_run = 0
         self._silence_run = 0
-        self._utter_ms = 0
+        self._utter_frames = 0
 
-    def _process_frame(self, frame: bytes) -> Tuple[bool, bool]:
+    def _process_frame(self, frame: PcmFrame) -> Tuple[bool, bool]:
         """处理一帧数据，返回 (speech_start, speech_end)"""
+        return self._advance(self._vad.is_speech(frame, self._sr))
+
+    def _advance(self, is_speech: bool) -> Tuple[bool, bool]:
+        """按一帧的 VAD 结果推进状态机，返回 (speech_start, speech_end)"""
         start = False
         end = False
 
-        is_speech = self._vad.is_speech(frame, self._cfg.sample_rate)
-        self._utter_ms += self._cfg.frame_ms
+        self._utter_frames += 1
 
         if is_speech:
             self._speech_run += 1
@@ -143,19 +222,19 @@ class EndpointDetector:
             self._speech_run = 0
 
         if not self._in_speech:
-            if is_speech and self._speech_run >= self._cfg.speech_start_frames:
+            if is_speech and self._speech_run >= self._start_frames:
                 self._in_speech = True
                 self._silence_run = 0
                 start = True
         else:
-            if (not is_speech and self._silence_run >= self._cfg.speech_end_silence_frames) or (
-                self._utter_ms >= self._cfg.max_utterance_ms
+            if (not is_speech and self._silence_run >= self._end_frames) or (
+                self._utter_frames >= self._max_frames
             ):
                 self._in_speech = False
                 end = True
                 self._speech_run = 0
                 self._silence_run = 0
-                self._utter_ms = 0
+                self._utter_frames = 0
 
         return start, end
 
@@ -164,16 +243,25 @@ class EndpointDetector:
         if not pcm_chunk:
             return False, False
 
-        self._buf.extend(pcm_chunk)
+        # 按偏移逐帧切出 memoryview 交给 VAD，不再每帧 del 头部，也不逐帧拷贝成 bytes
+        if self._buf:
+            self._buf += pcm_chunk
+            data = self._buf
+        else:
+            data = pcm_chunk
         start_any = False
         end_any = False
 
-        fb = self.frame_bytes
-        while len(self._buf) >= fb:
-            frame = bytes(self._buf[:fb])
-            del self._buf[:fb]
-            s, e = self._process_frame(frame)
-            start_any = start_any or s
-            end_any = end_any or e
+        fb = self._frame_bytes
+        whole = len(data) - len(data) % fb
+        with memoryview(data) as view:
+            if whole:
+                # 本次到达的整帧一次性交给 VAD 判定（EnergyVad 可向量化），再逐帧推进状态机
+                advance = self._advance
+                for is_speech in self._vad.is_speech_batch(view[:whole], fb, self._sr):
+                    s, e = advance(is_speech)
+                    start_any = start_any or s
+                    end_any = end_any or e
+            self._buf = bytearray(view[whole:])
 
         return start_any, end_any
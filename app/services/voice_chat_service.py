@@ -4,19 +4,22 @@
 
 from __future__ import annotations
 
-import io
 import logging
+import asyncio
+import re
+import struct
 import time
-import wave
 from dataclasses import dataclass
 from datetime import datetime
 import json
-from typing import List, Optional
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
 
-from sqlalchemy import func
+from sqlalchemy import bindparam, select, update
 from sqlalchemy.orm import Session
 
 from app.infra import storage_s3
+from app.infra.db import safe_select
 from app.domain import models
 from app.domain import safety
 from app.llm.model_selector import LlmModelSelector
@@ -26,6 +29,9 @@ from app.speech.client import SpeechClient
 
 logger = logging.getLogger("yoo-growth-buddy.voice")
 
+# 每轮语音都会按 device_sn 取设备：语句构造一次，参数走 bindparam，命中编译缓存
+_DEVICE_BY_SN_STMT = safe_select(models.Device).where(models.Device.device_sn == bindparam("device_sn"))
+
 
 @dataclass
 class VoiceTurnResult:
@@ -96,14 +102,15 @@ class VoiceChatService:
         session = self._get_or_create_session(db, child, session_id)
 
         # 3. 本轮 seq
-        seq = self._next_turn_seq(db, session.id)
-
-        # 4. 保存孩子语音（S3）
-        user_rel_path, _ = self._save_user_wav(child.id, session.id, seq, wav_bytes)
+        seq = self._next_turn_seq(session)
 
-        # 5. ASR
+        # 4+5. 保存孩子语音（S3）、ASR、历史/提示词查询三者互不依赖，并发进行
         try:
-            user_text_raw = await self._speech.asr(wav_bytes)
+            user_text_raw, (user_rel_path, _), messages = await _gather_settled(
+                self._speech.asr(wav_bytes),
+                self._save_user_wav(child.id, session.id, seq, wav_bytes),
+                asyncio.to_thread(self._fetch_history_and_prompt, db, child, device, session),
+            )
         except AudioFormatError as e:
             logger.error("ASR 音频格式错误: %s", e)
             raise
@@ -118,15 +125,17 @@ class VoiceChatService:
         # 6. 安全检查（输入）
         risk_source: Optional[str] = None
         risk_reason: Optional[str] = None
+        # 家长禁止话题本轮只解析一次，输入/输出检查共用
+        forbidden = _split_str(child.forbidden_topics)
 
-        in_risk, in_reason = self._guard_child_input(user_text, child)
+        in_risk, in_reason = self._guard_child_input(user_text, forbidden)
         if in_risk:
             risk_source = "input"
             risk_reason = in_reason
             reply_text_final = self._safe_reply(device)
         else:
-            # 7. 构造 LLM messages
-            messages = self._build_messages_for_llm(db, child, device, session, user_text)
+            # 7. 构造 LLM messages：历史已预取，只追加本轮输入
+            messages.append({"role": "user", "content": user_text})
 
             # 8. 调用 LLM
             provider, model_name, gen_cfg = self._llm_selector.select_for_child(child, task="chat")
@@ -143,7 +152,7 @@ class VoiceChatService:
 
             # 9. 安全收敛（输出）
             reply_text_candidate = self._sanitize_reply(child, reply_text_raw)
-            out_risk, out_reason = self._guard_reply_output(reply_text_candidate, child)
+            out_risk, out_reason = self._guard_reply_output(reply_text_candidate, forbidden)
             if out_risk:
                 risk_source = "output"
                 risk_reason = out_reason
@@ -158,9 +167,9 @@ class VoiceChatService:
             logger.error("TTS 合成失败: %s", e)
             raise
 
-        # 11. PCM → WAV + 上传（S3）
+        # 11. PCM → WAV；key 确定，上传与下面的落库并发进行
         reply_wav_bytes = _pcm_to_wav_bytes(reply_pcm)
-        reply_rel_path, _ = self._save_reply_wav(child.id, session.id, seq, reply_wav_bytes)
+        reply_rel_path = _reply_wav_key(child.id, session.id, seq)
 
         # 12. 写入 Turn（device_id 必须传）
         turn = models.Turn(
@@ -175,9 +184,10 @@ class VoiceChatService:
             risk_reason=risk_reason,
             created_at=int(time.time()),
         )
-        db.add(turn)
-        db.commit()
-        db.refresh(turn)
+        await _gather_settled(
+            self._save_reply_wav(child.id, session.id, seq, reply_wav_bytes),
+            asyncio.to_thread(self._insert_turn, db, session, turn),
+        )
 
         logger.info(
             "完成一轮对话: child_id=%s, session_id=%s, turn_id=%s, seq=%s",
@@ -216,18 +226,22 @@ class VoiceChatService:
         - 续播/播放由 WS 侧控制
         """
 
-        device, child = self._load_device_and_child(db, device_sn)
-        session = self._get_or_create_session(db, child, session_id)
-        seq = self._next_turn_seq(db, session.id)
+        # 同步 DB 访问放到工作线程，避免阻塞事件循环上的其他语音连接（Session 仍为顺序使用）
+        device, child, session, seq = await asyncio.to_thread(self._open_turn, db, device_sn, session_id)
 
-        # 1) 保存用户语音（S3）
-        user_rel_path, _ = self._save_user_wav(child.id, session.id, seq, wav_bytes)
-
-        # 2) ASR
+        # 1)+2) 保存用户语音（S3，上传线程池执行）、ASR、历史/提示词查询并发进行
+        upload_and_history = (
+            self._save_user_wav(child.id, session.id, seq, wav_bytes),
+            asyncio.to_thread(self._fetch_history_and_prompt, db, child, device, session),
+        )
         if user_text_override is not None:
             user_text_raw = user_text_override
+            (user_rel_path, _), messages = await _gather_settled(*upload_and_history)
         else:
-            user_text_raw = await self._speech.asr(wav_bytes)
+            user_text_raw, (user_rel_path, _), messages = await _gather_settled(
+                self._speech.asr(wav_bytes),
+                *upload_and_history,
+            )
 
         user_text = (user_text_raw or "").strip() or "（未识别到有效语音内容）"
 
@@ -235,15 +249,17 @@ class VoiceChatService:
         risk_source: Optional[str] = None
         risk_reason: Optional[str] = None
         audit_action = "allow"
+        # 家长禁止话题本轮只解析一次，输入/输出检查共用
+        forbidden = _split_str(child.forbidden_topics)
 
-        in_risk, in_reason = self._guard_child_input(user_text, child)
+        in_risk, in_reason = self._guard_child_input(user_text, forbidden)
         if in_risk:
             risk_source = "input"
             risk_reason = in_reason
             audit_action = "block_input"
             reply_text_final = self._safe_reply(device)
         else:
-            messages = self._build_messages_for_llm(db, child, device, session, user_text)
+            messages.append({"role": "user", "content": user_text})
             provider, model_name, gen_cfg = self._llm_selector.select_for_child(child, task="chat")
             reply_text_raw2 = await provider.chat(
                 messages,
@@ -255,7 +271,7 @@ class VoiceChatService:
             reply_text_raw2 = (reply_text_raw2 or "").strip()
 
             reply_text_candidate = self._sanitize_reply(child, reply_text_raw2)
-            out_risk, out_reason = self._guard_reply_output(reply_text_candidate, child)
+            out_risk, out_reason = self._guard_reply_output(reply_text_candidate, forbidden)
             if out_risk:
                 risk_source = "output"
                 risk_reason = out_reason
@@ -265,7 +281,7 @@ class VoiceChatService:
                 reply_text_final = reply_text_candidate
 
         # 4) 预置回复音频 key（真正上传由 WS 侧 finalize_turn 完成）
-        reply_rel_path = f"children/{child.id}/sessions/{session.id}/turn_{seq}_reply.wav"
+        reply_rel_path = _reply_wav_key(child.id, session.id, seq)
 
         # 5) 落库（playback_status 先置为 pending，便于续播/排障）
         turn = models.Turn(
@@ -285,9 +301,7 @@ class VoiceChatService:
             audit_action=audit_action,
             created_at=int(time.time()),
         )
-        db.add(turn)
-        db.commit()
-        db.refresh(turn)
+        await asyncio.to_thread(self._insert_turn, db, session, turn)
 
         return VoiceTurnDraft(
             child_id=child.id,
@@ -304,6 +318,24 @@ class VoiceChatService:
             policy_version=policy_version,
         )
 
+    def _open_turn(
+        self,
+        db: Session,
+        device_sn: str,
+        session_id: Optional[int],
+    ) -> tuple[models.Device, models.Child, models.ChatSession, int]:
+        """一轮开始前的同步 DB 步骤：设备/孩子、会话、轮次序号"""
+        device, child = self._load_device_and_child(db, device_sn)
+        session = self._get_or_create_session(db, child, session_id)
+        seq = self._next_turn_seq(session)
+        return device, child, session, seq
+
+    def _insert_turn(self, db: Session, session: models.ChatSession, turn: models.Turn) -> None:
+        # 会话 last_seq 与 Turn 同一事务提交
+        session.last_seq = turn.seq
+        db.add(turn)
+        # 主键在 flush 时已回填，其余字段均为客户端赋值（expire_on_commit=False），无需 refresh 再查一次
+        db.commit()
 
     def update_turn_runtime(
         self,
@@ -315,23 +347,16 @@ class VoiceChatService:
         audit_action: Optional[str] = None,
         metrics: Optional[dict] = None,
     ) -> None:
-        """更新播放态与链路指标（供 WS 流程调用）"""
-        turn = db.get(models.Turn, turn_id)
-        if turn is None:
-            return
-
-        turn.playback_status = playback_status
+        """更新播放态与链路指标（供 WS 流程调用）；单条 UPDATE，不先查再写"""
+        values: dict = {"playback_status": playback_status}
         if resume_count is not None:
-            turn.resume_count = int(resume_count)
+            values["resume_count"] = int(resume_count)
         if audit_action is not None:
-            turn.audit_action = audit_action
+            values["audit_action"] = audit_action
         if metrics is not None:
-            try:
-                turn.metrics_json = json.dumps(metrics, ensure_ascii=False)
-            except Exception:  # noqa: BLE001
-                turn.metrics_json = None
+            values["metrics_json"] = _dump_metrics(metrics)
 
-        db.add(turn)
+        db.execute(update(models.Turn).where(models.Turn.id == turn_id).values(**values))
         db.commit()
 
 
@@ -343,24 +368,23 @@ class VoiceChatService:
         reply_wav_bytes: bytes,
         playback_status: str = "completed",
         metrics: Optional[dict] = None,
+        reply_audio_path: Optional[str] = None,
     ) -> None:
-        """上传回复音频到 S3，并更新 turns 记录"""
+        """上传回复音频到 S3，并更新 turns 记录
 
-        turn = db.get(models.Turn, turn_id)
-        if turn is None:
-            return
+        reply_audio_path：调用方已知存储路径时传入，可省去一次查询
+        """
+        if reply_audio_path is None:
+            reply_audio_path = db.scalar(select(models.Turn.reply_audio_path).where(models.Turn.id == turn_id))
 
-        if turn.reply_audio_path:
-            storage_s3.upload_bytes(turn.reply_audio_path, reply_wav_bytes, content_type="audio/wav")
+        if reply_audio_path:
+            storage_s3.upload_bytes(reply_audio_path, reply_wav_bytes, content_type="audio/wav")
 
-        turn.playback_status = playback_status
+        values: dict = {"playback_status": playback_status}
         if metrics is not None:
-            try:
-                turn.metrics_json = json.dumps(metrics, ensure_ascii=False)
-            except Exception:  # noqa: BLE001
-                pass
+            values["metrics_json"] = _dump_metrics(metrics)
 
-        db.add(turn)
+        db.execute(update(models.Turn).where(models.Turn.id == turn_id).values(**values))
         db.commit()
 
 
@@ -381,14 +405,15 @@ class VoiceChatService:
         """
         device, child = self._load_device_and_child(db, device_sn)
         session = self._get_or_create_session(db, child, session_id)
-        seq = self._next_turn_seq(db, session.id)
-
-        # 保存用户语音（S3）
-        user_rel_path, _ = self._save_user_wav(child.id, session.id, seq, wav_bytes)
+        seq = self._next_turn_seq(session)
 
-        # ASR
+        # 保存用户语音（S3）、ASR、历史/提示词查询并发进行
         try:
-            user_text_raw = await self._speech.asr(wav_bytes)
+            user_text_raw, (user_rel_path, _), messages = await _gather_settled(
+                self._speech.asr(wav_bytes),
+                self._save_user_wav(child.id, session.id, seq, wav_bytes),
+                asyncio.to_thread(self._fetch_history_and_prompt, db, child, device, session),
+            )
         except AudioFormatError as e:
             logger.error("ASR 音频格式错误: %s", e)
             raise
@@ -403,14 +428,16 @@ class VoiceChatService:
         # 输入安全检查
         risk_source: Optional[str] = None
         risk_reason: Optional[str] = None
+        # 家长禁止话题本轮只解析一次，输入/输出检查共用
+        forbidden = _split_str(child.forbidden_topics)
 
-        in_risk, in_reason = self._guard_child_input(user_text, child)
+        in_risk, in_reason = self._guard_child_input(user_text, forbidden)
         if in_risk:
             risk_source = "input"
             risk_reason = in_reason
             reply_text_final = self._safe_reply(device)
         else:
-            messages = self._build_messages_for_llm(db, child, device, session, user_text)
+            messages.append({"role": "user", "content": user_text})
             provider, model_name, gen_cfg = self._llm_selector.select_for_child(child, task="chat")
             logger.info("调用 LLM: provider=%s, model=%s", getattr(provider, "name", "unknown"), model_name)
 
@@ -424,7 +451,7 @@ class VoiceChatService:
             reply_text_raw = (reply_text_raw or "").strip()
 
             reply_text_candidate = self._sanitize_reply(child, reply_text_raw)
-            out_risk, out_reason = self._guard_reply_output(reply_text_candidate, child)
+            out_risk, out_reason = self._guard_reply_output(reply_text_candidate, forbidden)
             if out_risk:
                 risk_source = "output"
                 risk_reason = out_reason
@@ -432,22 +459,21 @@ class VoiceChatService:
             else:
                 reply_text_final = reply_text_candidate
 
-        # TTS 流式合成：边播报边累积，用于最终落盘/上传
-        reply_pcm_parts: List[bytes] = []
+        # TTS 流式合成：边播报边直接追加到 WAV 缓冲区（先占位 44 字节头），不再保留分块列表
+        reply_wav_bytes = bytearray(_WAV_HEADER.size)
         try:
             async for chunk in self._speech.tts_stream(reply_text_final, cancel_event=cancel_event):
                 if not chunk:
                     continue
-                reply_pcm_parts.append(chunk)
+                reply_wav_bytes += chunk
                 await on_tts_chunk(chunk)
         except SpeechError as e:
             logger.error("TTS 合成失败: %s", e)
             raise
 
-        reply_pcm = b"".join(reply_pcm_parts)
-        reply_wav_bytes = _pcm_to_wav_bytes(reply_pcm)
+        _pack_wav_header(reply_wav_bytes, len(reply_wav_bytes) - _WAV_HEADER.size)
 
-        reply_rel_path, _ = self._save_reply_wav(child.id, session.id, seq, reply_wav_bytes)
+        reply_rel_path = _reply_wav_key(child.id, session.id, seq)
 
         turn = models.Turn(
             session_id=session.id,
@@ -461,9 +487,10 @@ class VoiceChatService:
             risk_reason=risk_reason,
             created_at=int(time.time()),
         )
-        db.add(turn)
-        db.commit()
-        db.refresh(turn)
+        await _gather_settled(
+            self._save_reply_wav(child.id, session.id, seq, reply_wav_bytes),
+            asyncio.to_thread(self._insert_turn, db, session, turn),
+        )
 
         return VoiceTurnResult(
             child_id=child.id,
@@ -483,18 +510,14 @@ class VoiceChatService:
         db: Session,
         device_sn: str,
     ) -> tuple[models.Device, models.Child]:
-        device = (
-            db.query(models.Device)
-            .filter(models.Device.device_sn == device_sn)
-            .first()
-        )
+        device = db.execute(_DEVICE_BY_SN_STMT, {"device_sn": device_sn}).scalar_one_or_none()
         if device is None:
             raise ValueError(f"Device not found: sn={device_sn}")
 
         if device.bound_child_id is None:
             raise ValueError(f"Device not bound to child: sn={device_sn}")
 
-        child = db.query(models.Child).get(device.bound_child_id)
+        child = db.get(models.Child, device.bound_child_id)
         if child is None:
             raise ValueError(f"Child not found: id={device.bound_child_id}")
 
@@ -516,72 +539,47 @@ class VoiceChatService:
         session.child_id = child.id
         db.add(session)
         db.commit()
-        db.refresh(session)
         return session
 
-    def _next_turn_seq(self, db: Session, session_id: int) -> int:
-        last_seq = (
-            db.query(func.max(models.Turn.seq))
-            .filter(models.Turn.session_id == session_id)
-            .scalar()
-        )
-        if last_seq is None:
-            return 1
-        return int(last_seq) + 1
+    def _next_turn_seq(self, session: models.ChatSession) -> int:
+        # 会话行已加载：直接读 last_seq，不再查 MAX(seq)
+        return (session.last_seq or 0) + 1
 
-    def _build_messages_for_llm(
+    def _fetch_history_and_prompt(
         self,
         db: Session,
         child: models.Child,
         device: models.Device,
         session: models.ChatSession,
-        current_user_text: str,
     ) -> List[dict]:
-        interests = _split_str(child.interests)
-        forbidden = _split_str(child.forbidden_topics)
-
-        toy_name = device.toy_name or "小悠"
-        toy_persona = (
-            device.toy_persona
-            or f"一个叫{toy_name}的温柔可爱小伙伴，会认真听小朋友说话，轻声细语，喜欢鼓励和安慰小朋友。"
-        )
-
-        system_prompt = (
-            f"你是一个儿童智能语音陪伴玩具，名字叫「{toy_name}」。"
-            f"你的性格设定：{toy_persona}。"
-            f"说话对象是一个大约 {child.age} 岁的孩子，性别：{child.gender or '未知'}。"
-            f"孩子的兴趣：{', '.join(interests) if interests else '暂时未知'}。"
-            f"家长禁止谈论的话题：{', '.join(forbidden) if forbidden else '无特别限制'}。"
-            "和孩子聊天时要遵守这些原则："
-            "1）用简短、温柔、具体的句子，像小朋友的好朋友一样说话；"
-            "2）多鼓励、多肯定，避免批评；"
-            "3）遇到危险、暴力、隐私、敏感内容时婉拒，并引导到安全健康的话题；"
-            "4）不要出现成人世界的复杂概念（如色情、血腥、极端政治等）；"
-            "5）一定用中文回答。"
+        """系统提示词 + 最近历史轮次（不含本轮输入）；不依赖 ASR 结果，可与 ASR 并发执行"""
+        # 同一孩子/设备的系统提示词每轮不变：按原始字段值缓存渲染结果
+        system_prompt = _render_system_prompt(
+            device.toy_name,
+            device.toy_persona,
+            child.age,
+            child.gender,
+            child.interests,
+            child.forbidden_topics,
         )
 
-        messages: List[dict] = [
-            {"role": "system", "content": system_prompt},
+        # 只取最近 N 轮的两列（倒序 LIMIT 走 ix_turns_session_seq），按时间顺序展开
+        history_rows = db.execute(
+            select(models.Turn.user_text, models.Turn.reply_text)
+            .where(models.Turn.session_id == session.id)
+            .order_by(models.Turn.seq.desc())
+            .limit(self._max_history_turns)
+        ).all()
+
+        messages: List[dict] = [{"role": "system", "content": system_prompt}]
+        # 每轮展开为 user/assistant 两条，跳过空文本；一次推导式构建，不逐条 append
+        messages += [
+            {"role": role, "content": content}
+            for user_text, reply_text in reversed(history_rows)
+            for role, content in (("user", user_text), ("assistant", reply_text))
+            if content
         ]
 
-        history_turns: List[models.Turn] = (
-            db.query(models.Turn)
-            .filter(models.Turn.session_id == session.id)
-            .order_by(models.Turn.seq.asc())
-            .all()
-        )
-
-        if len(history_turns) > self._max_history_turns:
-            history_turns = history_turns[-self._max_history_turns :]
-
-        for t in history_turns:
-            if t.user_text:
-                messages.append({"role": "user", "content": t.user_text})
-            if t.reply_text:
-                messages.append({"role": "assistant", "content": t.reply_text})
-
-        messages.append({"role": "user", "content": current_user_text})
-
         return messages
 
 
@@ -594,16 +592,16 @@ class VoiceChatService:
             "或者你喜欢的玩具、动画片、游戏～"
         )
 
-    def _guard_child_input(self, text: str, child: models.Child) -> tuple[bool, str]:
+    def _guard_child_input(self, text: str, forbidden: Tuple[str, ...]) -> tuple[bool, str]:
         try:
-            safety.check_child_input(text, extra_forbidden_topics=_split_str(child.forbidden_topics))
+            safety.check_child_input(text, extra_forbidden_topics=forbidden)
             return False, ""
         except safety.SafetyViolation as e:
             return True, e.reason
 
-    def _guard_reply_output(self, text: str, child: models.Child) -> tuple[bool, str]:
+    def _guard_reply_output(self, text: str, forbidden: Tuple[str, ...]) -> tuple[bool, str]:
         try:
-            safety.check_reply_output(text, extra_forbidden_topics=_split_str(child.forbidden_topics))
+            safety.check_reply_output(text, extra_forbidden_topics=forbidden)
             return False, ""
         except safety.SafetyViolation as e:
             return True, e.reason
@@ -611,27 +609,7 @@ class VoiceChatService:
     def _sanitize_reply(self, child: models.Child, reply_text: str) -> str:
         text = reply_text or ""
 
-        forbidden = _split_str(child.forbidden_topics)
-        risk_keywords = set(forbidden) | {
-            "自杀",
-            "杀人",
-            "暴力",
-            "色情",
-            "毒品",
-            "赌博",
-        }
-
-        lowered = text.lower()
-
-        def _contains_risk() -> bool:
-            for kw in risk_keywords:
-                if not kw:
-                    continue
-                if kw.lower() in lowered:
-                    return True
-            return False
-
-        if not text or _contains_risk():
+        if not text or _compile_risk_matcher(child.forbidden_topics or "").search(text):
             toy_name = "小悠"
             return (
                 f"{toy_name}觉得这个话题有点不安全，"
@@ -643,12 +621,13 @@ class VoiceChatService:
         return text
 
     def _generate_session_title(self, db: Session, session: models.ChatSession) -> str:
-        first_turn: models.Turn | None = (
-            db.query(models.Turn)
-            .filter(models.Turn.session_id == session.id)
+        # 只取标题需要的两列，不加载整行（metrics_json 等大字段）
+        first_turn = db.execute(
+            select(models.Turn.user_text, models.Turn.reply_text)
+            .where(models.Turn.session_id == session.id)
             .order_by(models.Turn.seq.asc())
-            .first()
-        )
+            .limit(1)
+        ).first()
 
         if first_turn is not None:
             base_text = first_turn.user_text or first_turn.reply_text or ""
@@ -663,43 +642,163 @@ class VoiceChatService:
         date_str = dt.strftime("%Y-%m-%d")
         return f"{date_str} 和小yo的聊天"
 
-    def _save_user_wav(
+    async def _save_user_wav(
         self,
         child_id: int,
         session_id: int,
         seq: int,
         wav_bytes: bytes,
     ) -> tuple[str, str]:
-        """保存孩子原始语音到 S3"""
+        """保存孩子原始语音到 S3（上传线程池执行，不阻塞事件循环）"""
         key = f"children/{child_id}/sessions/{session_id}/turn_{seq}_user.wav"
-        storage_s3.upload_bytes(key, wav_bytes, content_type="audio/wav")
+        await storage_s3.upload_bytes_async(key, wav_bytes, content_type="audio/wav")
         return key, key
 
-    def _save_reply_wav(
+    async def _save_reply_wav(
         self,
         child_id: int,
         session_id: int,
         seq: int,
         reply_wav_bytes: bytes,
     ) -> tuple[str, str]:
-        key = f"children/{child_id}/sessions/{session_id}/turn_{seq}_reply.wav"
-        storage_s3.upload_bytes(key, reply_wav_bytes, content_type="audio/wav")
+        key = _reply_wav_key(child_id, session_id, seq)
+        await storage_s3.upload_bytes_async(key, reply_wav_bytes, content_type="audio/wav")
         return key, key
 
-def _split_str(s: str | None) -> List[str]:
-    if not s:
-        return []
-    return [x.strip() for x in s.split(",") if x.strip()]
 
+def _reply_wav_key(child_id: int, session_id: int, seq: int) -> str:
+    return f"children/{child_id}/sessions/{session_id}/turn_{seq}_reply.wav"
+
+
+async def _gather_settled(*aws):
+    """并发等待全部完成后再抛出第一个异常：避免 ASR 失败时仍有工作线程在使用同一个 db Session"""
+    results = await asyncio.gather(*aws, return_exceptions=True)
+    for r in results:
+        if isinstance(r, BaseException):
+            raise r
+    return results
+
+
+def _dump_metrics(metrics: dict) -> Optional[str]:
+    try:
+        return json.dumps(metrics, ensure_ascii=False)
+    except Exception:  # noqa: BLE001
+        return None
 
-def _pcm_to_wav_bytes(pcm: bytes, *, sample_rate: int = 16000) -> bytes:
+
+_SPLIT_RE = re.compile(r"\s*,\s*")
+
+
+@lru_cache(maxsize=1024)
+def _split_str(s: str | None) -> Tuple[str, ...]:
+    """逗号分隔字符串 -> 元组；同一孩子每轮要解析多次（提示词、输入/输出安全检查），按原串缓存"""
+    if not s:
+        return ()
+    return tuple(x for x in _SPLIT_RE.split(s.strip()) if x)
+
+
+@lru_cache(maxsize=1024)
+def _render_system_prompt(
+    toy_name: Optional[str],
+    toy_persona: Optional[str],
+    age: int,
+    gender: Optional[str],
+    interests_csv: Optional[str],
+    forbidden_csv: Optional[str],
+) -> str:
+    """渲染 LLM 系统提示词；参数均为可哈希的原始字段，孩子/设备资料修改后自然换 key"""
+    interests = _split_str(interests_csv)
+    forbidden = _split_str(forbidden_csv)
+
+    toy_name = toy_name or "小悠"
+    toy_persona = (
+        toy_persona
+        or f"一个叫{toy_name}的温柔可爱小伙伴，会认真听小朋友说话，轻声细语，喜欢鼓励和安慰小朋友。"
+    )
+
+    return (
+        f"你是一个儿童智能语音陪伴玩具，名字叫「{toy_name}」。"
+        f"你的性格设定：{toy_persona}。"
+        f"说话对象是一个大约 {age} 岁的孩子，性别：{gender or '未知'}。"
+        f"孩子的兴趣：{', '.join(interests) if interests else '暂时未知'}。"
+        f"家长禁止谈论的话题：{', '.join(forbidden) if forbidden else '无特别限制'}。"
+        "和孩子聊天时要遵守这些原则："
+        "1）用简短、温柔、具体的句子，像小朋友的好朋友一样说话；"
+        "2）多鼓励、多肯定，避免批评；"
+        "3）遇到危险、暴力、隐私、敏感内容时婉拒，并引导到安全健康的话题；"
+        "4）不要出现成人世界的复杂概念（如色情、血腥、极端政治等）；"
+        "5）一定用中文回答。"
+    )
+
+
+# 回复兜底检查的固定风险词（另加孩子的 forbidden_topics）
+_REPLY_RISK_KEYWORDS: Tuple[str, ...] = ("自杀", "杀人", "暴力", "色情", "毒品", "赌博")
+
+
+@lru_cache(maxsize=4096)
+def _compile_risk_matcher(forbidden_csv: str) -> "re.Pattern[str]":
+    """风险词编译为一个忽略大小写的交替正则，一次扫描回复文本；按孩子的禁止话题原串缓存"""
+    kws = dict.fromkeys(_split_str(forbidden_csv) + _REPLY_RISK_KEYWORDS)
+    # 关键词全为无大小写的字符（中文）时不开 IGNORECASE，匹配时省去逐字符大小写折叠
+    flags = re.IGNORECASE if any(k.lower() != k.upper() for k in kws) else 0
+    return re.compile("|".join(re.escape(k) for k in kws), flags)
+
+
+# 16k/单声道/16bit 的 44 字节 RIFF 头：格式预编译一次
+_WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+# 两个长度字段（RIFF 块大小 @4、data 块大小 @40）
+_WAV_SIZE_FIELD = struct.Struct("<I")
+# 本服务的音频固定为 16k/单声道/16bit：头部只有两个长度字段随内容变化，其余字节导入时生成一次
+_WAV_HEADER_16K = _WAV_HEADER.pack(
+    b"RIFF", 36, b"WAVE", b"fmt ", 16, 1, 1, 16000, 32000, 2, 16, b"data", 0
+)
+
+
+def _pcm_to_wav_bytes(pcm: "bytes | bytearray | memoryview", *, sample_rate: int = 16000) -> bytearray:
     """
     把 16bit 单声道 PCM 包装成标准 WAV 字节
+    预分配 44 字节头 + PCM 的缓冲区，直接拷入（接受 bytearray/memoryview，调用方无需先转 bytes）
+    """
+    return _pcm_chunks_to_wav_bytes((pcm,), sample_rate=sample_rate)
+
+
+def _pcm_chunks_to_wav_bytes(chunks: Sequence["bytes | bytearray | memoryview"], *, sample_rate: int = 16000) -> bytearray:
+    """
+    同上，输入为按序的 PCM 分块：各块直接拷入预分配缓冲区，不需要先拼接成整段 PCM
     """
-    buf = io.BytesIO()
-    with wave.open(buf, "wb") as wf:
-        wf.setnchannels(1)
-        wf.setsampwidth(2)  # 16bit
-        wf.setframerate(sample_rate)
-        wf.writeframes(pcm)
-    return buf.getvalue()
+    n = sum(memoryview(c).nbytes for c in chunks)
+    out = bytearray(_WAV_HEADER.size + n)
+    _pack_wav_header(out, n, sample_rate=sample_rate)
+    pos = _WAV_HEADER.size
+    for c in chunks:
+        size = memoryview(c).nbytes
+        out[pos:pos + size] = c
+        pos += size
+    return out
+
+
+def _pack_wav_header(buf: bytearray, n: int, *, sample_rate: int = 16000) -> None:
+    """把 PCM 长度为 n 的 WAV 头写入 buf 的前 44 字节（buf 需已预留头部空间）"""
+    if sample_rate == 16000:
+        # 常见路径：拷入预生成的头部，只回填两个长度字段
+        buf[:_WAV_HEADER.size] = _WAV_HEADER_16K
+        _WAV_SIZE_FIELD.pack_into(buf, 4, 36 + n)
+        _WAV_SIZE_FIELD.pack_into(buf, 40, n)
+        return
+    _WAV_HEADER.pack_into(
+        buf,
+        0,
+        b"RIFF",
+        36 + n,
+        b"WAVE",
+        b"fmt ",
+        16,  # fmt chunk size
+        1,  # PCM
+        1,  # mono
+        sample_rate,
+        sample_rate * 2,  # byte rate
+        2,  # block align
+        16,  # bits per sample
+        b"data",
+        n,
+    )
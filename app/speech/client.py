@@ -5,8 +5,10 @@
 from __future__ import annotations
 
 import asyncio
+import contextvars
 import ssl
-from typing import Any, Dict
+from collections import deque
+from typing import Any, Deque, Dict, Optional
 
 import certifi
 
@@ -14,6 +16,27 @@ from app.infra.config import settings
 from app.speech.asr_xfyun import XfyunAsrClient
 from app.speech.tts_xfyun import XfyunTtsClient
 
+# tts_stream 中工作线程结束的标记
+_STREAM_END = object()
+
+
+def _build_ssl_context() -> ssl.SSLContext:
+    """生产环境校验证书（certifi CA）；其他环境不校验"""
+    if getattr(settings, "ENV", "dev") == "production":
+        return ssl.create_default_context(cafile=certifi.where())
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+
+_SSL_CONTEXT = _build_ssl_context()
+
+
+def _consume_result(fut: asyncio.Future) -> None:
+    if not fut.cancelled():
+        fut.exception()
+
 
 class SpeechClient:
     """
@@ -30,15 +53,8 @@ class SpeechClient:
         if not (app_id and api_key and api_secret):
             raise ValueError("讯飞配置未完整设置，请检查 XFYUN_APPID/XFYUN_API_KEY/XFYUN_API_SECRET")
 
-        if getattr(settings, "ENV", "dev") == "production":
-            sslopt: Dict[str, Any] = {
-                "cert_reqs": ssl.CERT_REQUIRED,
-                "ca_certs": certifi.where(),
-            }
-        else:
-            sslopt = {
-                "cert_reqs": ssl.CERT_NONE,
-            }
+        # ASR/TTS 共用进程级 SSLContext：CA 证书只加载一次，握手时不再逐连接新建 context
+        sslopt: Dict[str, Any] = {"context": _SSL_CONTEXT}
 
         self._asr = XfyunAsrClient(
             app_id=app_id,
@@ -62,31 +78,83 @@ class SpeechClient:
         return await asyncio.to_thread(self._tts.synthesize, text)
 
 
-    async def tts_stream(self, text: str, *, cancel_event: asyncio.Event | None = None):
+    async def tts_stream(
+        self,
+        text: str,
+        *,
+        cancel_event: asyncio.Event | None = None,
+        min_chunk_bytes: int = 0,
+    ):
         """
-        流式 TTS：返回一个异步迭代器，按分片产出 PCM bytes（16k,16bit,mono）,底层仍然是 websocket-client 的同步实现，通过线程 + asyncio.Queue 桥接
+        流式 TTS：返回一个异步迭代器，按分片产出 PCM bytes（16k,16bit,mono）,底层仍然是 websocket-client 的同步实现，通过线程 + deque 桥接
+
+        工作线程直接 append 到 deque，只在没有待执行的唤醒时才 call_soon_threadsafe 唤醒一次；
+        消费端被唤醒后一次取空 deque，多个分片合并为一次产出
+
+        min_chunk_bytes：默认 0，每次唤醒取到的分片立即产出（首包不等待）；想让下游少发小帧的调用方可传正数，
+        小分片累积到该大小再产出，结束、出错或 cancel_event 置位时立即产出余量
         """
-        q: asyncio.Queue = asyncio.Queue()
         loop = asyncio.get_running_loop()
-
-        def _on_chunk(chunk: bytes) -> None:
-            loop.call_soon_threadsafe(q.put_nowait, chunk)
+        buf: Deque[Any] = deque()
+        waiter: Optional[asyncio.Future] = None
+        wake_pending = False
+
+        def _wake() -> None:
+            # 先清标志再唤醒：之后线程新 append 的分片要么被本次唤醒后一并取走，要么触发新的唤醒
+            nonlocal wake_pending
+            wake_pending = False
+            if waiter is not None and not waiter.done():
+                waiter.set_result(None)
+
+        # 每个分片都会调用 _push：绑定方法提前取出，省去逐次属性查找
+        append = buf.append
+        call_soon_threadsafe = loop.call_soon_threadsafe
+
+        def _push(item: Any) -> None:
+            nonlocal wake_pending
+            append(item)
+            if not wake_pending:
+                wake_pending = True
+                call_soon_threadsafe(_wake)
 
         def _run() -> None:
             try:
-                self._tts.synthesize_stream(text, on_chunk=_on_chunk, should_cancel=(cancel_event.is_set if cancel_event else None))
-                loop.call_soon_threadsafe(q.put_nowait, None)
+                self._tts.synthesize_stream(text, on_chunk=_push, should_cancel=(cancel_event.is_set if cancel_event else None))
+                _push(_STREAM_END)
             except Exception as e:  # noqa: BLE001
-                loop.call_soon_threadsafe(q.put_nowait, e)
-                loop.call_soon_threadsafe(q.put_nowait, None)
+                _push(e)
 
-        # 在后台线程运行同步 TTS WebSocket
-        asyncio.create_task(asyncio.to_thread(_run))
+        # 在后台线程运行同步 TTS WebSocket：直接提交到默认线程池（不再额外包一层 Task），
+        # 与 to_thread 一样带上当前上下文（trace_id 等）；_run 自行转交异常，回调里取走结果避免告警
+        fut = loop.run_in_executor(None, contextvars.copy_context().run, _run)
+        fut.add_done_callback(_consume_result)
 
+        popleft = buf.popleft
+        pending = bytearray()
         while True:
-            item = await q.get()
-            if item is None:
+            while not buf:
+                waiter = loop.create_future()
+                try:
+                    await waiter
+                finally:
+                    waiter = None
+
+            end: Any = None
+            while buf:
+                item = popleft()
+                if item is _STREAM_END or isinstance(item, Exception):
+                    end = item
+                    break
+                pending += item
+
+            if pending and (
+                len(pending) >= min_chunk_bytes
+                or end is not None
+                or (cancel_event is not None and cancel_event.is_set())
+            ):
+                yield bytes(pending)
+                pending.clear()
+            if isinstance(end, Exception):
+                raise end
+            if end is _STREAM_END:
                 break
-            if isinstance(item, Exception):
-                raise item
-            yield item
@@ -23,6 +23,8 @@ from wsgiref.handlers import format_date_time
 from app.infra.ylogger import ylogger
 from app.speech.asr_xfyun import SpeechError
 
+# 流式合成固定校验证书：SSLContext 与 CA 证书在导入时加载一次，每次连接复用
+_VERIFIED_SSLOPT: Dict[str, Any] = {"context": ssl.create_default_context(cafile=certifi.where())}
 
 @dataclass
 class _TtsResult:
@@ -289,7 +291,7 @@ class XfyunTtsClient:
 
         ws_thread = threading.Thread(
             target=ws.run_forever,
-            kwargs={"sslopt": {"cert_reqs": ssl.CERT_REQUIRED, "ca_certs": certifi.where()}},
+            kwargs={"sslopt": _VERIFIED_SSLOPT},
             daemon=True,
         )
         ws_thread.start()
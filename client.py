@@ -14,40 +14,68 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import io
 import os
-import threading
+import socket
+import struct
 import time
 import wave
-from typing import Optional
+from typing import Optional, Tuple
 
 import paho.mqtt.client as mqtt
 
+try:  # 可选：更快的事件循环实现
+    import uvloop  # type: ignore
+except ImportError:  # pragma: no cover
+    uvloop = None  # type: ignore
+
 
 def load_and_check_wav(path: str) -> bytes:
     """读取 WAV 文件并校验为 16k / 单声道 / 16bit"""
     if not os.path.exists(path):
         raise FileNotFoundError(f"WAV 文件不存在: {path}")
 
-    with wave.open(path, "rb") as wf:
-        nchannels = wf.getnchannels()
-        sampwidth = wf.getsampwidth()
-        framerate = wf.getframerate()
-
-        if nchannels != 1:
-            raise ValueError(f"需要单声道(channels=1), 当前 channels={nchannels}")
-        if sampwidth != 2:
-            raise ValueError(f"需要 16bit 采样宽度(sampwidth=2), 当前 sampwidth={sampwidth}")
-        if framerate != 16000:
-            raise ValueError(f"需要采样率 16000Hz, 当前 framerate={framerate}")
+    # 整个文件只读一次，校验直接解析内存中的头部
+    with open(path, "rb") as f:
+        data = f.read()
 
-        frames = wf.readframes(wf.getnframes())
+    nchannels, sampwidth, framerate = _wav_format(data)
+    if nchannels != 1:
+        raise ValueError(f"需要单声道(channels=1), 当前 channels={nchannels}")
+    if sampwidth != 2:
+        raise ValueError(f"需要 16bit 采样宽度(sampwidth=2), 当前 sampwidth={sampwidth}")
+    if framerate != 16000:
+        raise ValueError(f"需要采样率 16000Hz, 当前 framerate={framerate}")
 
     # 这里返回完整的 WAV 文件字节，而不是裸 PCM
-    with open(path, "rb") as f:
-        return f.read()
+    return data
+
+
+# RIFF 头 + fmt 块（声道数 @22、采样率 @24、位深 @34）
+_RIFF_FMT = struct.Struct("<4sI4s4sIHHIIHH")
+
+
+def _wav_format(data: bytes) -> Tuple[int, int, int]:
+    """返回 (声道数, 采样字节数, 采样率)；fmt 紧跟 RIFF 头的常见布局直接 unpack，其余交给 wave 解析"""
+    if len(data) >= _RIFF_FMT.size:
+        riff, _, wave_id, fmt_id, _, _, nchannels, framerate, _, _, bits = _RIFF_FMT.unpack_from(data, 0)
+        if riff == b"RIFF" and wave_id == b"WAVE" and fmt_id == b"fmt ":
+            return nchannels, bits // 8, framerate
+    with wave.open(io.BytesIO(data), "rb") as wf:
+        return wf.getnchannels(), wf.getsampwidth(), wf.getframerate()
+
+
+# 仅 Linux 提供
+_TCP_CORK: Optional[int] = getattr(socket, "TCP_CORK", None)
 
 
 class MqttVoiceClient:
+    """paho 客户端挂到 asyncio 事件循环上：socket 读写由事件循环直接驱动，不再另起网络线程
+
+    （paho 的外部事件循环接口：on_socket_open/close、on_socket_register/unregister_write）
+    """
+
     def __init__(
         self,
         broker_host: str,
@@ -59,18 +87,70 @@ class MqttVoiceClient:
         self._broker_port = broker_port
         self._device_sn = device_sn
         self._timeout = timeout
+        self._request_topic = f"toy/{device_sn}/voice/request"
+        self._reply_topic = f"toy/{device_sn}/voice/reply"
+        # 回复超过 broker 单包上限时可分片下发：若干条 .../reply/part，最后一条 .../reply/end（可带最后一片数据）
+        self._reply_part_topic = self._reply_topic + "/part"
+        self._reply_end_topic = self._reply_topic + "/end"
 
         self._client = mqtt.Client(
             client_id=f"test-client-{int(time.time())}",
             clean_session=True,
         )
 
-        self._reply_event = threading.Event()
-        self._reply_bytes: Optional[bytes] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reply: Optional["asyncio.Future[bytes]"] = None
+        # 分片回复的拼接缓冲：bytearray 原地 extend，避免逐片 bytes 拼接的二次方拷贝
+        self._reply_buf = bytearray()
+        self._closed: Optional["asyncio.Future[None]"] = None
+        self._misc_task: Optional[asyncio.Task] = None
 
         self._client.on_connect = self._on_connect
         self._client.on_message = self._on_message
+        self._client.on_socket_open = self._on_socket_open
+        self._client.on_socket_close = self._on_socket_close
+        self._client.on_socket_register_write = self._on_socket_register_write
+        self._client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    def _on_socket_open(self, client: mqtt.Client, userdata, sock) -> None:
+        # 关闭 Nagle：小包（SUBSCRIBE/PINGREQ 等）立即发出；加大发送缓冲，整段 WAV 少分几次写入
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+        self._loop.add_reader(sock, client.loop_read)
+        self._misc_task = self._loop.create_task(self._misc_loop())
+
+    def _on_socket_close(self, client: mqtt.Client, userdata, sock) -> None:
+        self._loop.remove_reader(sock)
+        if self._misc_task is not None:
+            self._misc_task.cancel()
+        if self._closed is not None and not self._closed.done():
+            self._closed.set_result(None)
+
+    def _on_socket_register_write(self, client: mqtt.Client, userdata, sock) -> None:
+        self._loop.add_writer(sock, self._write_corked, client, sock)
+
+    @staticmethod
+    def _write_corked(client: mqtt.Client, sock) -> None:
+        # 一次可写回调里 loop_write 会连续写出所有排队报文（CONNECT/SUBSCRIBE/PUBLISH 在同一轮排队）；
+        # Linux 下用 TCP_CORK 包住，让这些小报文合并成尽量少的 TCP 段（TCP_NODELAY 下否则逐个发出）
+        if _TCP_CORK is None:
+            client.loop_write()
+            return
+        sock.setsockopt(socket.IPPROTO_TCP, _TCP_CORK, 1)
+        try:
+            client.loop_write()
+        finally:
+            # 写出 DISCONNECT 后 paho 会在 loop_write 内关闭 socket
+            if sock.fileno() != -1:
+                sock.setsockopt(socket.IPPROTO_TCP, _TCP_CORK, 0)
 
+    def _on_socket_unregister_write(self, client: mqtt.Client, userdata, sock) -> None:
+        self._loop.remove_writer(sock)
+
+    async def _misc_loop(self) -> None:
+        # keepalive/重传等定时任务（原本由 loop_start 线程负责）
+        while self._client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            await asyncio.sleep(1)
 
     def _on_connect(self, client: mqtt.Client, userdata, flags, rc) -> None:  # type: ignore[override]
         if rc == 0:
@@ -83,58 +163,102 @@ class MqttVoiceClient:
         payload = msg.payload
         print(f"[MQTT] 收到消息: topic={topic}, bytes={len(payload)}")
 
-        expected_topic = f"toy/{self._device_sn}/voice/reply"
-        if topic != expected_topic:
+        if topic == self._reply_part_topic:
+            self._reply_buf.extend(payload)
+            return
+        if topic == self._reply_end_topic:
+            self._reply_buf.extend(payload)
+            payload = self._reply_buf
+            self._reply_buf = bytearray()
+        elif topic != self._reply_topic:
             print(f"[MQTT] 非预期 topic, 忽略: {topic}")
             return
 
-        self._reply_bytes = payload
-        self._reply_event.set()
+        # 回调在事件循环内（loop_read）执行，直接完成 Future
+        if self._reply is not None and not self._reply.done():
+            self._reply.set_result(payload)
+
+    async def connect(self) -> None:
+        """连接 broker 并订阅回复 topic；连接在多轮请求间复用，直到 close()"""
+        if self._loop is not None:
+            return
+        # reply/# 同时匹配整条回复（reply 本身）与分片（reply/part、reply/end）
+        reply_topic = self._reply_topic + "/#"
 
+        self._loop = asyncio.get_running_loop()
+        self._closed = self._loop.create_future()
 
-    def send_and_wait_reply(self, wav_bytes: bytes) -> bytes:
-        """发送语音请求并阻塞等待回复 WAV 字节"""
-        request_topic = f"toy/{self._device_sn}/voice/request"
-        reply_topic = f"toy/{self._device_sn}/voice/reply"
-        # 连接 broker
+        # 连接 broker（socket 建立后即由事件循环接管读写）
         self._client.connect(self._broker_host, self._broker_port, keepalive=60)
 
         # 订阅回复 topic
-        self._client.subscribe(reply_topic)
+        self._client.subscribe(reply_topic, qos=0)
         print(f"[MQTT] 订阅: {reply_topic}")
 
-        # 启动网络循环线程
-        self._client.loop_start()
-
+    async def close(self) -> None:
+        if self._loop is None:
+            return
+        # DISCONNECT 报文也由事件循环写出，等 socket 关闭后再返回
+        self._client.disconnect()
         try:
-            # 发送请求
-            print(f"[MQTT] 发布语音请求: topic={request_topic}, bytes={len(wav_bytes)}")
-            self._client.publish(request_topic, wav_bytes)
-
-            # 等待回复
-            if not self._reply_event.wait(self._timeout):
-                raise TimeoutError(f"{self._timeout} 秒内未收到回复")
-
-            if self._reply_bytes is None:
-                raise RuntimeError("收到回复事件，但 payload 为空")
+            await asyncio.wait_for(self._closed, 5)
+        except asyncio.TimeoutError:
+            pass
+        self._loop = None
+
+    async def __aenter__(self) -> "MqttVoiceClient":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def send_and_wait_reply(self, wav_bytes: bytes) -> bytes:
+        """发送语音请求并等待回复 WAV 字节（未连接时先建立连接）"""
+        request_topic = self._request_topic
+
+        # 首轮：connect() 内部没有 await，CONNECT/SUBSCRIBE 与下面的 PUBLISH 在同一轮排队，由一次可写回调一并写出
+        await self.connect()
+        self._reply = self._loop.create_future()
+        # 丢弃上一轮超时遗留的残缺分片
+        self._reply_buf = bytearray()
+
+        # 发送请求
+        print(f"[MQTT] 发布语音请求: topic={request_topic}, bytes={len(wav_bytes)}")
+        # QoS 0：单条语音无需 PUBACK 往返，超时由下面的等待兜底
+        self._client.publish(request_topic, wav_bytes, qos=0)
+
+        # 等待回复
+        try:
+            reply_bytes = await asyncio.wait_for(self._reply, self._timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"{self._timeout} 秒内未收到回复") from None
+        finally:
+            self._reply = None
 
-            print(f"[MQTT] 收到回复字节: {len(self._reply_bytes)}")
-            return self._reply_bytes
+        if not reply_bytes:
+            raise RuntimeError("收到回复事件，但 payload 为空")
 
-        finally:
-            self._client.loop_stop()
-            self._client.disconnect()
+        print(f"[MQTT] 收到回复字节: {len(reply_bytes)}")
+        return reply_bytes
 
 
 def save_reply_wav(reply_bytes: bytes, output_dir: str, device_sn: str) -> str:
     """把回复 WAV 字节保存成文件，文件名带时间戳"""
     os.makedirs(output_dir, exist_ok=True)
-    ts = int(time.time())
+    # 毫秒时间戳：--repeat 连续多轮时同一秒内的回复不会互相覆盖
+    ts = time.time_ns() // 1_000_000
     filename = f"reply_{device_sn}_{ts}.wav"
     full_path = os.path.join(output_dir, filename)
 
-    with open(full_path, "wb") as f:
-        f.write(reply_bytes)
+    # 直接 os.write 整段写出，不经 BufferedWriter 再拷一次
+    fd = os.open(full_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(reply_bytes)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
 
     print(f"[FILE] 已保存回复音频: {full_path}")
     return full_path
@@ -178,6 +302,12 @@ def main() -> None:
         default=30,
         help="等待回复超时时间（秒，默认 30）",
     )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="同一连接上连续发送的轮数（默认 1）",
+    )
 
     args = parser.parse_args()
 
@@ -189,8 +319,16 @@ def main() -> None:
         timeout=args.timeout,
     )
 
-    reply_bytes = client.send_and_wait_reply(wav_bytes)
-    save_reply_wav(reply_bytes, args.output_dir, args.device_sn)
+    async def _run() -> None:
+        # 多轮请求复用同一连接与订阅
+        async with client:
+            for _ in range(args.repeat):
+                reply_bytes = await client.send_and_wait_reply(wav_bytes)
+                save_reply_wav(reply_bytes, args.output_dir, args.device_sn)
+
+    # 装了 uvloop 就用它驱动事件循环，否则回退到标准 asyncio（用 Runner + loop_factory，不依赖 uvloop>=0.18 才有的 uvloop.run）
+    with asyncio.Runner(loop_factory=uvloop.new_event_loop if uvloop is not None else None) as runner:
+        runner.run(_run())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# @Author: yaccii
+# @Description:
+
+from __future__ import annotations
+
+import asyncio
+import unittest
+
+from app.application.ws.voice_ws_handler import _AUDIO_FRAME_MAX, _coalesce_audio
+
+
+def _drain(items):
+    """按 writer 的方式把队列发完，返回发出的 (kind, data) 序列"""
+    outq: asyncio.Queue = asyncio.Queue()
+    for item in items:
+        outq.put_nowait(item)
+
+    sent = []
+    pending = None
+    while pending is not None or not outq.empty():
+        kind, data = pending if pending is not None else outq.get_nowait()
+        pending = None
+        if kind == "j":
+            sent.append((kind, data))
+            continue
+        frame, pending = _coalesce_audio(data, outq)
+        sent.append(("b", frame))
+    return sent
+
+
+class CoalesceAudioTest(unittest.TestCase):
+    def assert_frames_bounded(self, sent):
+        for kind, data in sent:
+            if kind == "b":
+                self.assertLessEqual(len(data), _AUDIO_FRAME_MAX)
+
+    def test_chunk_larger_than_remaining_room_starts_next_frame(self):
+        chunk = b"\x01" * (_AUDIO_FRAME_MAX // 2 + 1000)
+        items = [("b", chunk)] * 5
+        sent = _drain(items)
+
+        self.assert_frames_bounded(sent)
+        self.assertEqual(b"".join(d for _, d in sent), chunk * 5)
+        self.assertEqual(len(sent), 5)
+
+    def test_small_chunks_fill_frame_up_to_cap(self):
+        chunk = bytes(range(250)) * 4  # 1000 字节
+        sent = _drain([("b", chunk)] * 40)
+
+        self.assert_frames_bounded(sent)
+        self.assertEqual(b"".join(d for _, d in sent), chunk * 40)
+        self.assertEqual(len(sent[0][1]), (_AUDIO_FRAME_MAX // len(chunk)) * len(chunk))
+
+    def test_oversized_chunk_is_split(self):
+        chunk = b"\x02" * (_AUDIO_FRAME_MAX * 2 + 123)
+        sent = _drain([("b", b"\x03" * 100), ("b", chunk)])
+
+        self.assert_frames_bounded(sent)
+        self.assertEqual(b"".join(d for _, d in sent), b"\x03" * 100 + chunk)
+
+    def test_control_message_keeps_order(self):
+        items = [("b", b"a" * 3000), ("b", b"b" * 3000), ("j", "{}"), ("b", b"c" * 3000)]
+        sent = _drain(items)
+
+        self.assert_frames_bounded(sent)
+        self.assertEqual(sent, [("b", b"a" * 3000 + b"b" * 3000), ("j", "{}"), ("b", b"c" * 3000)])
+
+
+if __name__ == "__main__":
+    unittest.main()
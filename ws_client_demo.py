@@ -17,17 +17,45 @@ from __future__ import annotations
 
 import argparse
 import asyncio
-import json
+import io
 import os
+import struct
 import wave
 
+import orjson
 import websockets
 
+try:  # 可选：更快的事件循环实现
+    import uvloop  # type: ignore
+except ImportError:  # pragma: no cover
+    uvloop = None  # type: ignore
+
+
+# 标准 44 字节 WAV 头：声道数 @22、采样率 @24、位深 @34、data 块大小 @40
+_WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+
+
+# 控制消息内容固定：导入时序列化一次。须以 str 发送（文本帧），bytes 会被服务端当作音频
+_STOP_MSG = orjson.dumps({"type": "stop"}).decode()
+_RESUME_MSG = orjson.dumps({"type": "resume"}).decode()
+_PING_MSG = orjson.dumps({"type": "ping"}).decode()
+
 
 def read_wav_pcm(path: str) -> bytes:
     if not os.path.exists(path):
         raise FileNotFoundError(path)
-    with wave.open(path, "rb") as wf:
+    with open(path, "rb") as f:
+        data = f.read()
+
+    # 常见的 44 字节标准头：直接 unpack 校验并切出 PCM；其他布局（LIST 块等）交给 wave 解析
+    if len(data) >= _WAV_HEADER.size:
+        riff, _, wave_id, fmt_id, _, _, nchannels, framerate, _, _, bits, data_id, size = _WAV_HEADER.unpack_from(data, 0)
+        if riff == b"RIFF" and wave_id == b"WAVE" and fmt_id == b"fmt " and data_id == b"data":
+            if nchannels != 1 or bits != 16 or framerate != 16000:
+                raise ValueError("WAV 必须为 16kHz/16bit/mono")
+            return data[_WAV_HEADER.size : _WAV_HEADER.size + size]
+
+    with wave.open(io.BytesIO(data), "rb") as wf:
         if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != 16000:
             raise ValueError("WAV 必须为 16kHz/16bit/mono")
         return wf.readframes(wf.getnframes())
@@ -38,15 +66,23 @@ async def main():
     parser.add_argument("--url", type=str, required=True, help="e.g. ws://127.0.0.1:8000/ws/voice/DEV001")
     parser.add_argument("--input-wav", type=str, required=True)
     parser.add_argument("--frame-ms", type=int, default=20)
+    parser.add_argument("--batch-ms", type=int, default=100, help="每条二进制消息携带的音频时长（按帧数取整）")
     parser.add_argument("--stop-at", type=float, default=0.0, help="seconds after TTS start to send stop")
     parser.add_argument("--resume-after", type=float, default=0.0, help="seconds after stop to send resume")
     args = parser.parse_args()
 
     pcm = read_wav_pcm(args.input_wav)
+    # 发送时按字节偏移切片：memoryview 切片零拷贝（不 cast 成 'h'，ws.send 按字节长度发送）
+    pcm_view = memoryview(pcm)
     bytes_per_ms = 16000 * 2 // 1000  # 16kHz * 2 字节（16bit）
     frame_size = bytes_per_ms * args.frame_ms
+    # 多帧合并为一条消息发送：减少 WebSocket 分帧与 TCP 写入次数
+    batch_frames = max(1, args.batch_ms // args.frame_ms)
+    batch_size = frame_size * batch_frames
+    batch_sec = args.frame_ms * batch_frames / 1000.0
 
-    async with websockets.connect(args.url, max_size=50 * 1024 * 1024) as ws:
+    # write_limit 限定待发缓冲约为几批音频：对端/网络跟不上时 ws.send 会等待排空（TCP 背压），不在内存里越积越多
+    async with websockets.connect(args.url, max_size=50 * 1024 * 1024, write_limit=batch_size * 4) as ws:
         print("Connected")
 
         tts_started = False
@@ -60,38 +96,44 @@ async def main():
                 if isinstance(msg, bytes):
                     # TTS 音频
                     print(f"[BIN] {len(msg)} bytes")
-                else:
-                    try:
-                        ev = json.loads(msg)
-                        print("[EV]", ev)
-                        if ev.get("type") == "tts_start":
-                            tts_started = True
-                            if args.stop_at > 0 and not stop_sent:
-                                async def _send_stop_resume() -> None:
-                                    nonlocal stop_sent
-                                    await asyncio.sleep(args.stop_at)
-                                    await ws.send(json.dumps({"type": "stop"}))
-                                    stop_sent = True
-                                    if args.resume_after > 0:
-                                        await asyncio.sleep(args.resume_after)
-                                        await ws.send(json.dumps({"type": "resume"}))
-
-                                stop_task = asyncio.create_task(_send_stop_resume())
-                    except Exception:
-                        print("[TXT]", msg)
+                    continue
+
+                # 文本帧均为服务端 JSON 事件（send_json）：直接解析，格式异常即抛出
+                ev = orjson.loads(msg)
+                print("[EV]", ev)
+                if ev.get("type") == "tts_start":
+                    tts_started = True
+                    if args.stop_at > 0 and not stop_sent:
+                        async def _send_stop_resume() -> None:
+                            nonlocal stop_sent
+                            await asyncio.sleep(args.stop_at)
+                            await ws.send(_STOP_MSG)
+                            stop_sent = True
+                            if args.resume_after > 0:
+                                await asyncio.sleep(args.resume_after)
+                                await ws.send(_RESUME_MSG)
+
+                        stop_task = tg.create_task(_send_stop_resume())
 
         async def sender():
-            # 以二进制帧发送 PCM
-            for i in range(0, len(pcm), frame_size):
-                await ws.send(pcm[i : i + frame_size])
-                await asyncio.sleep(args.frame_ms / 1000.0)
+            # 以二进制帧发送 PCM：按批切 memoryview（不拷贝），按批时长实时节奏发送
+            for i in range(0, len(pcm_view), batch_size):
+                await ws.send(pcm_view[i : i + batch_size])
+                # 发完一批先让出一次，接收端的 TTS 音频/事件优先处理，再按节奏休眠
+                await asyncio.sleep(0)
+                await asyncio.sleep(batch_sec)
             # 心跳
             while True:
-                await ws.send(json.dumps({"type": "ping"}))
+                await ws.send(_PING_MSG)
                 await asyncio.sleep(10)
 
-        await asyncio.gather(receiver(), sender())
+        # TaskGroup：任一方异常（如连接关闭）即取消另一方；receiver 先创建，先于 sender 被调度
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(receiver())
+            tg.create_task(sender())
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # 装了 uvloop 就用它驱动事件循环，否则回退到标准 asyncio（用 Runner + loop_factory，不依赖 uvloop>=0.18 才有的 uvloop.run）
+    with asyncio.Runner(loop_factory=uvloop.new_event_loop if uvloop is not None else None) as runner:
+        runner.run(main())